@@ -0,0 +1,59 @@
+"""
+Compare pairwise and blocked author matching.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_author_match.py --candidates 2000 --roster 3000
+"""
+import argparse
+import random
+
+from butils import report, timed
+
+from vdm.author_names import Author, catalyst_match, match_many
+
+FIRST = [u"john", u"jane", u"griffin", u"maria", u"wei", u"ahmed", u"sarah",
+         u"david", u"li", u"olga", u"james", u"jonathan", u"josiah"]
+MIDDLE = [None, u"a", u"d", u"m", u"t"]
+
+
+def synthetic_authors(count, last_names, rand):
+    authors = []
+    for _ in range(count):
+        last = u"last%d" % rand.randrange(last_names)
+        first = rand.choice(FIRST)
+        middle = rand.choice(MIDDLE)
+        authors.append(Author(
+            full=u"{0}, {1}".format(last, first),
+            last=last,
+            first=first,
+            first_initial=first[0],
+            middle=middle,
+            middle_initial=middle
+        ))
+    return authors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--candidates', type=int, default=2000)
+    parser.add_argument('--roster', type=int, default=3000)
+    parser.add_argument('--last-names', type=int, default=1500)
+    args = parser.parse_args()
+
+    rand = random.Random(1)
+    candidates = synthetic_authors(args.candidates, args.last_names, rand)
+    roster = synthetic_authors(args.roster, args.last_names, rand)
+
+    def pairwise():
+        return [
+            (cand, au) for cand in candidates for au in roster
+            if catalyst_match(cand, au)
+        ]
+
+    assert pairwise() == match_many(candidates, roster)
+    comparisons = len(candidates) * len(roster)
+    report('pairwise catalyst_match', timed(pairwise, repeat=1), comparisons, 'pairs')
+    report('blocked match_many', timed(lambda: match_many(candidates, roster)), comparisons, 'pairs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Load test VIVOBackend against the local stand-in endpoint.  Reports
+update throughput for batch sizes and worker counts and FacultyMember
+query latency, with artificial latency per request to mimic a remote
+store.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_backend_load.py --faculty 200 --latency 0.02
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+from butils import faculty_graph, report
+
+from rdflib import Graph, RDF
+
+from vdm.backend import VIVOBackend
+from vdm.models import FacultyMember
+from vdm.namespaces import VIVO
+from vdm.standin import StandinEndpoint
+
+
+def per_subject(g):
+    """
+    Split a graph into one add graph per subject, the edits a load
+    makes.
+    """
+    edits = {}
+    for triple in g:
+        edits.setdefault(triple[0], Graph()).add(triple)
+    return list(edits.values())
+
+
+def load_batched(backend, edits, batch_size, workers):
+    """
+    Send the edits with a BatchWriter per worker.  Returns the number
+    of requests.
+    """
+    def run(part):
+        with backend.batch(max_triples=batch_size) as writer:
+            for add_g in part:
+                writer.add_remove(add_g, Graph())
+        assert writer.failures == []
+        return writer.requests
+
+    parts = [edits[n::workers] for n in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(run, parts))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--faculty', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='seconds added to each request')
+    parser.add_argument('--batch-sizes', default='100,1000,5000')
+    parser.add_argument('--workers', default='1,4')
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    source = faculty_graph(faculty=args.faculty)
+    edits = per_subject(source)
+    triples = len(source)
+    print(u"{0} triples in {1} edits".format(triples, len(edits)))
+
+    for batch_size in [int(v) for v in args.batch_sizes.split(',')]:
+        for workers in [int(v) for v in args.workers.split(',')]:
+            with StandinEndpoint(latency=args.latency) as endpoint:
+                os.environ.update(endpoint.environ())
+                backend = VIVOBackend(endpoint.query_url)
+                start = time.perf_counter()
+                requests = load_batched(backend, edits, batch_size, workers)
+                seconds = time.perf_counter() - start
+                assert len(endpoint.graph) == triples
+            report(
+                u"batch {0}, {1} workers, {2} requests".format(batch_size, workers, requests),
+                seconds, triples, 'triples'
+            )
+
+    with StandinEndpoint(latency=args.latency) as endpoint:
+        os.environ.update(endpoint.environ())
+        backend = VIVOBackend(endpoint.query_url)
+        start = time.perf_counter()
+        backend.stream_add_remove(source, Graph())
+        report(u"stream_add_remove", time.perf_counter() - start, triples, 'triples')
+
+        faculty = sorted(source.subjects(RDF.type, VIVO.FacultyMember))[:args.queries]
+
+        def timed_query(uri):
+            start = time.perf_counter()
+            FacultyMember(uri=uri, store=backend.graph)
+            return time.perf_counter() - start
+
+        for workers in [int(v) for v in args.workers.split(',')]:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                latencies = list(pool.map(timed_query, faculty))
+            report(
+                u"FacultyMember, {0} workers".format(workers),
+                time.perf_counter() - start, len(faculty), 'queries'
+            )
+            print(u"{0:<40} p50 {1:.1f} ms, p95 {2:.1f} ms".format(
+                u"", percentile(latencies, 0.5) * 1000, percentile(latencies, 0.95) * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main()
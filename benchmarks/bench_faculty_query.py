@@ -0,0 +1,164 @@
+"""
+Compare FacultyMember query forms on a synthetic in memory store and
+against the same data behind the local stand-in endpoint, with added
+latency per request.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_faculty_query.py --faculty 500 --latency 0.02
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from butils import faculty_graph, report, timed
+
+from rdflib import ConjunctiveGraph
+from rdflib.compare import isomorphic
+
+from vdm.backend import FusekiGraph
+from vdm.models import FacultyMember, merge_graphs, prepared_query
+from vdm.namespaces import D
+from vdm.standin import StandinEndpoint
+
+#The single UNION query FacultyMember used before it was split.
+LEGACY_QUERY = """
+CONSTRUCT {
+    ?subject a vivo:FacultyMember ;
+        rdfs:label ?name ;
+        foaf:firstName ?first ;
+        foaf:lastName ?last ;
+        vivo:preferredTitle ?title ;
+        tmp:email ?email ;
+        vivo:overview ?overview ;
+        blocal:hasAffiliation ?org ;
+        vivo:educationalTraining ?edu ;
+        vivo:hasResearchArea ?ra ;
+        tmp:image ?photo ;
+        tmp:fullImage ?miURL ;
+        blocal:hasGeographicResearchArea ?rag ;
+        tmp:facultyTitle ?facultyTitle ;
+        tmp:administrativeTitle ?adminTitle .
+    ?org rdfs:label ?orgName .
+    ?edu rdfs:label ?degree .
+    ?ra rdfs:label ?raName .
+    ?rag rdfs:label ?ragName .
+}
+WHERE {
+    {
+    ?subject a vivo:FacultyMember ;
+        rdfs:label ?name ;
+        foaf:firstName ?first ;
+        foaf:lastName ?last .
+    }
+    UNION { ?subject vivo:preferredTitle ?title . }
+    UNION { ?subject vivo:primaryEmail ?email . }
+    UNION { ?subject vivo:overview ?overview . }
+    UNION {
+        ?subject blocal:hasAffiliation ?org .
+        ?org rdfs:label ?orgName .
+    }
+    UNION {
+        ?subject vivo:educationalTraining ?edu .
+        ?edu a vivo:EducationalTraining ;
+            rdfs:label ?degree .
+    }
+    UNION {
+        ?subject vivo:hasResearchArea ?ra .
+        ?ra a blocal:ResearchArea ;
+            rdfs:label ?raName .
+    }
+    UNION {
+        ?subject blocal:hasGeographicResearchArea ?rag .
+        ?rag a blocal:Place ;
+            rdfs:label ?ragName .
+    }
+    UNION {
+        ?subject vitropublic:mainImage ?mi .
+        ?mi vitropublic:downloadLocation ?miDl .
+        ?miDl vitropublic:directDownloadUrl ?miURL .
+        ?mi vitropublic:thumbnailImage ?ti .
+        ?ti vitropublic:downloadLocation ?dl .
+        ?dl vitropublic:directDownloadUrl ?photo .
+    }
+    UNION {
+        ?subject vivo:personInPosition ?pos .
+        ?pos a vivo:FacultyPosition;
+            rdfs:label ?facultyTitle.
+    }
+    UNION {
+        ?subject vivo:personInPosition ?pos .
+        ?pos a vivo:FacultyAdministrativePosition;
+            rdfs:label ?adminTitle.
+    }
+}
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--faculty', type=int, default=200,
+                        help='faculty in the synthetic store')
+    parser.add_argument('--sample', type=int, default=25,
+                        help='faculty loaded per timing')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='seconds added to each stand-in request')
+    args = parser.parse_args()
+
+    store = faculty_graph(faculty=args.faculty)
+    uris = [D['fac%d' % n] for n in range(min(args.sample, args.faculty))]
+    print(u"{0} triples, {1} faculty, loading {2}".format(
+        len(store), args.faculty, len(uris)))
+
+    combined = FacultyMember.__new__(FacultyMember).init_query()
+
+    def run_single(rq):
+        for uri in uris:
+            store.query(rq, initBindings=dict(subject=uri)).graph
+
+    #Same triples from each form.
+    for uri in uris[:3]:
+        legacy = store.query(LEGACY_QUERY, initBindings=dict(subject=uri)).graph
+        split = FacultyMember(uri=uri, store=store).graph
+        assert isomorphic(legacy, split)
+
+    report('legacy union query', timed(lambda: run_single(LEGACY_QUERY)), len(uris), 'faculty')
+    report('legacy union query, prepared', timed(
+        lambda: run_single(prepared_query(LEGACY_QUERY))
+    ), len(uris), 'faculty')
+    report('combined init_query, prepared', timed(
+        lambda: run_single(prepared_query(combined))
+    ), len(uris), 'faculty')
+    report('split init_queries', timed(
+        lambda: [FacultyMember(uri=uri, store=store) for uri in uris]
+    ), len(uris), 'faculty')
+    report('load_many', timed(
+        lambda: FacultyMember.load_many(uris, store)
+    ), len(uris), 'faculty')
+
+    data = ConjunctiveGraph()
+    data += store
+    with StandinEndpoint(latency=args.latency, graph=data) as endpoint:
+        remote = FusekiGraph(endpoint.query_url)
+        sections = FacultyMember.__new__(FacultyMember).init_queries(remote=False)
+
+        def split_remote():
+            #The per-section queries, four at a time.
+            def run(rq, uri):
+                return remote.query(rq, initBindings=dict(subject=uri)).graph
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for uri in uris:
+                    merge_graphs(list(executor.map(run, sections, [uri] * len(sections))))
+
+        for uri in uris[:3]:
+            assert isomorphic(FacultyMember(uri=uri, store=remote).graph,
+                              FacultyMember(uri=uri, store=store).graph)
+        label = u", stand-in {0:.0f} ms".format(args.latency * 1000)
+        report('split init_queries' + label, timed(split_remote, repeat=1), len(uris), 'faculty')
+        report('FacultyMember' + label, timed(
+            lambda: [FacultyMember(uri=uri, store=remote) for uri in uris], repeat=1
+        ), len(uris), 'faculty')
+        report('load_many' + label, timed(
+            lambda: FacultyMember.load_many(uris, remote), repeat=1
+        ), len(uris), 'faculty')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Import time of the vdm modules, from `python -X importtime` in a fresh
+interpreter for each module.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_import.py
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+MODULES = [
+    'vdm', 'vdm.utils', 'vdm.text', 'vdm.author_names', 'vdm.session',
+    'vdm.cache', 'vdm.context', 'vdm.catalyst', 'vdm.crossref',
+    'vdm.pubmed', 'vdm.harvest', 'vdm.namespaces', 'vdm.backend',
+    'vdm.models', 'vdm.jsonld',
+]
+
+
+def import_time(module):
+    """
+    Cumulative microseconds to import the module.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {0}'.format(module)],
+        cwd=ROOT, stderr=subprocess.PIPE, check=True
+    )
+    for line in proc.stderr.decode('utf-8').splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if (len(parts) == 3) and (parts[2] == module):
+            return int(parts[1])
+    raise Exception("No import time for {0}.".format(module))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        best = min(import_time(module) for _ in range(args.repeat))
+        print(u"{0:<20} {1:>10.1f} ms".format(module, best / 1000.0))
+
+
+if __name__ == '__main__':
+    main()
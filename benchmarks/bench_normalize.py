@@ -0,0 +1,50 @@
+"""
+Microbenchmark for vdm.text.normalize on author and venue strings.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_normalize.py --strings 50000
+"""
+import argparse
+import random
+
+from butils import report, timed
+
+from tests.test_text import reference_normalize
+from vdm.text import normalize
+
+NAMES = [
+    u"Smith, John D.", u"Müller-Lüdenscheidt, Hans", u"O'Brien, Siobhán",
+    u"Ångström, Anders", u"Nguyễn, Thị Minh", u"García-Márquez, Gabriel",
+    u"The Journal of Pediatrics", u"Proc. Natl. Acad. Sci. U.S.A.",
+    u"Blood\n", u"  Brown   University  ",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--strings', type=int, default=50000)
+    parser.add_argument('--distinct', type=int, default=5000,
+                        help='distinct strings in the input')
+    args = parser.parse_args()
+
+    rand = random.Random(1)
+    distinct = [
+        u"{0} {1}".format(rand.choice(NAMES), n) for n in range(args.distinct)
+    ]
+    strings = [rand.choice(distinct) for _ in range(args.strings)]
+    uncached = normalize.__wrapped__
+
+    def run(fn):
+        for text in strings:
+            fn(text)
+
+    def cached():
+        normalize.cache_clear()
+        run(normalize)
+
+    report('reference normalize', timed(lambda: run(reference_normalize)), len(strings), 'strings')
+    report('table normalize, no cache', timed(lambda: run(uncached)), len(strings), 'strings')
+    report('table normalize, cached', timed(cached), len(strings), 'strings')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Time the FacultyMember accessors used to render a profile.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_resource_accessors.py
+"""
+import argparse
+
+from butils import faculty_graph, report, timed
+
+from vdm.models import FacultyMember
+from vdm.namespaces import D
+
+
+def profile_json(fac):
+    return {
+        'label': fac.get_label(),
+        'first': fac.first(),
+        'last': fac.last(),
+        'email': fac.email(),
+        'title': fac.title(),
+        'overview': fac.overview(),
+        'thumbnail': fac.thumbnail(),
+        'image': fac.full_image(),
+        'faculty_titles': fac.faculty_titles(),
+        'administrative_titles': fac.administrative_titles(),
+        'membership': fac.membership(),
+        'topics': fac.topics(),
+        'places': fac.places(),
+        'education': fac.education(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--faculty', type=int, default=50)
+    parser.add_argument('--renders', type=int, default=200,
+                        help='profile renders per faculty member')
+    args = parser.parse_args()
+
+    store = faculty_graph(faculty=args.faculty)
+    faculty = FacultyMember.load_many(
+        [D['fac%d' % n] for n in range(args.faculty)], store
+    )
+
+    def render():
+        for fac in faculty:
+            for _ in range(args.renders):
+                profile_json(fac)
+
+    report('profile json', timed(render), args.faculty * args.renders, 'profiles')
+    report('index', timed(lambda: [fac.index() for fac in faculty]), args.faculty, 'resources')
+
+
+if __name__ == '__main__':
+    main()
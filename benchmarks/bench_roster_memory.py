@@ -0,0 +1,59 @@
+"""
+Memory used by a list of Author tuples compared with an AuthorRoster.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_roster_memory.py --authors 200000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+
+from butils import report, timed
+
+from bench_author_match import synthetic_authors
+from vdm.author_names import AuthorRoster, match_many
+
+
+def copies(authors):
+    """
+    Give every author its own string objects, as parsing names does.
+    """
+    for au in authors:
+        yield au._replace(**dict(
+            (field, None if value is None else u"".join(list(value)))
+            for field, value in zip(au._fields, au)
+        ))
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--authors', type=int, default=200000)
+    parser.add_argument('--last-names', type=int, default=50000)
+    args = parser.parse_args()
+
+    rand = random.Random(1)
+    source = synthetic_authors(args.authors, args.last_names, rand)
+
+    authors, list_bytes = measure(lambda: list(copies(source)))
+    roster, roster_bytes = measure(lambda: AuthorRoster(copies(source)))
+    print(u"list of Author tuples {0:>8.1f} MB".format(list_bytes / 1e6))
+    print(u"AuthorRoster          {0:>8.1f} MB ({1:.0%} of list)".format(
+        roster_bytes / 1e6, float(roster_bytes) / list_bytes))
+
+    candidates = authors[:1000]
+    assert match_many(candidates, roster) == match_many(candidates, authors)
+    report('match_many on list, with blocking', timed(lambda: match_many(candidates, authors)), len(candidates), 'candidates')
+    report('match_many on roster', timed(lambda: match_many(candidates, roster)), len(candidates), 'candidates')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Converting prepped publications to RDF with rdflib's JSON-LD to_rdf,
+to_rdf reusing the processed context and vdm.jsonld.to_graph.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_to_graph.py --records 2000
+"""
+import argparse
+
+from rdflib import Graph
+from rdflib.plugins.parsers.jsonld import to_rdf
+
+from butils import report, timed
+
+from tests.tutils import load
+from vdm import crossref, pubmed
+from vdm.jsonld import parse, to_graph
+from vdm.namespaces import D
+
+
+def prepped_records(count):
+    sources = [
+        pubmed.Publication().prep(load('pubmed_article.json')['result']['23910982']),
+        pubmed.Publication().prep(load('pubmed_article_unicode.json')['result']['24948623']),
+        crossref.Publication().prep(load('crossref_article.json')),
+        crossref.Publication().prep(load('crossref_conf-paper.json')),
+    ]
+    out = []
+    for n in range(count):
+        prepped = dict(sources[n % len(sources)])
+        prepped['uri'] = D['pub{0}'.format(n)]
+        prepped['contributor'] = ['fac{0}'.format(n % 100)]
+        out.append(prepped)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=2000)
+    args = parser.parse_args()
+
+    records = prepped_records(args.records)
+    report('to_rdf', timed(lambda: [to_rdf(r, Graph()) for r in records]), len(records), 'records')
+    report('to_rdf, processed context', timed(lambda: [parse(r, Graph()) for r in records]), len(records), 'records')
+    report('jsonld.to_graph', timed(lambda: [to_graph(r) for r in records]), len(records), 'records')
+
+    def into_one(convert):
+        g = Graph()
+        for r in records:
+            convert(r, g)
+
+    report('to_rdf, one graph', timed(lambda: into_one(to_rdf)), len(records), 'records')
+    report('jsonld.to_graph, one graph', timed(lambda: into_one(to_graph)), len(records), 'records')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Helpers for the benchmarks.
+
+Run benchmarks from the repository root with the data namespace set, e.g.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/bench_faculty_query.py
+"""
+import os
+import sys
+import time
+
+#Let the benchmarks import vdm from a checkout.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from rdflib import Literal, RDF, RDFS
+
+from vdm.backend import work_graph
+from vdm.namespaces import D, FOAF, VIVO, BLOCAL, VITROPUBLIC, BCITE
+
+
+def timed(fn, repeat=3):
+    """
+    Call fn repeat times and return the best time in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if (best is None) or (elapsed < best):
+            best = elapsed
+    return best
+
+
+def report(name, seconds, count, unit='ops'):
+    print(u"{0:<40} {1:>10.2f} ms {2:>12.0f} {3}/s".format(
+        name, seconds * 1000, count / seconds, unit
+    ))
+
+
+def faculty_graph(faculty=100, orgs=20, topics=50, pubs=5):
+    """
+    Build an in memory graph with faculty profiles shaped like VIVO data.
+    """
+    g = work_graph()
+    for n in range(orgs):
+        org = D['org%d' % n]
+        g.add((org, RDF.type, FOAF.Organization))
+        g.add((org, RDFS.label, Literal(u"Department %d" % n)))
+    for n in range(topics):
+        topic = D['topic%d' % n]
+        g.add((topic, RDF.type, BLOCAL.ResearchArea))
+        g.add((topic, RDFS.label, Literal(u"Topic %d" % n)))
+    for n in range(faculty):
+        fac = D['fac%d' % n]
+        g.add((fac, RDF.type, VIVO.FacultyMember))
+        g.add((fac, RDF.type, FOAF.Person))
+        g.add((fac, RDFS.label, Literal(u"Last%d, First%d" % (n, n))))
+        g.add((fac, FOAF.firstName, Literal(u"First%d" % n)))
+        g.add((fac, FOAF.lastName, Literal(u"Last%d" % n)))
+        g.add((fac, VIVO.primaryEmail, Literal(u"fac%d@school.edu" % n)))
+        g.add((fac, VIVO.preferredTitle, Literal(u"Professor %d" % n)))
+        g.add((fac, VIVO.overview, Literal(u"Researcher number %d." % n)))
+        for k in range(2):
+            g.add((fac, BLOCAL.hasAffiliation, D['org%d' % ((n + k) % orgs)]))
+            edu = D['edu%d_%d' % (n, k)]
+            g.add((fac, VIVO.educationalTraining, edu))
+            g.add((edu, RDF.type, VIVO.EducationalTraining))
+            g.add((edu, RDFS.label, Literal(u"Degree %d" % k)))
+        for k in range(3):
+            g.add((fac, VIVO.hasResearchArea, D['topic%d' % ((n * 3 + k) % topics)]))
+        place = D['place%d' % n]
+        g.add((fac, BLOCAL.hasGeographicResearchArea, place))
+        g.add((place, RDF.type, BLOCAL.Place))
+        g.add((place, RDFS.label, Literal(u"Place %d" % n)))
+        image = D['image%d' % n]
+        thumb = D['thumb%d' % n]
+        g.add((fac, VITROPUBLIC.mainImage, image))
+        g.add((image, VITROPUBLIC.downloadLocation, D['imageDl%d' % n]))
+        g.add((D['imageDl%d' % n], VITROPUBLIC.directDownloadUrl, Literal(u"/file/%d/full.jpg" % n)))
+        g.add((image, VITROPUBLIC.thumbnailImage, thumb))
+        g.add((thumb, VITROPUBLIC.downloadLocation, D['thumbDl%d' % n]))
+        g.add((D['thumbDl%d' % n], VITROPUBLIC.directDownloadUrl, Literal(u"/file/%d/thumb.jpg" % n)))
+        for k, ptype in enumerate([VIVO.FacultyPosition, VIVO.FacultyAdministrativePosition]):
+            pos = D['pos%d_%d' % (n, k)]
+            g.add((fac, VIVO.personInPosition, pos))
+            g.add((pos, RDF.type, ptype))
+            g.add((pos, RDFS.label, Literal(u"Position %d of %d" % (k, n))))
+        for k in range(pubs):
+            pub = D['pub%d_%d' % (n, k)]
+            g.add((pub, RDF.type, BCITE.Article))
+            g.add((pub, RDFS.label, Literal(u"Article %d by %d" % (k, n))))
+            g.add((pub, BCITE.hasContributor, fac))
+    return g
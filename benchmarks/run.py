@@ -0,0 +1,251 @@
+"""
+Offline benchmark suite.  Times each stage of a publication load
+against the recorded PubMed and CrossRef payloads in tests/data, a
+synthetic Catalyst response (tests/data/catalyst_pmids.xml, 250
+generated PMIDs in the service's response format) and synthetic
+graphs, and reports per-stage throughput.  No network access is
+needed.
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python benchmarks/run.py
+
+Save the results and compare a later run against them to catch
+regressions, e.g. before a nightly load:
+
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --baseline baseline.json --tolerance 0.25
+
+The comparison exits with status 1 when a stage is slower than the
+baseline by more than the tolerance.  --scale multiplies the input
+sizes and --stage picks stages by name.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+from butils import faculty_graph, report, timed
+
+from tests.tutils import DATA_PATH, load
+from vdm import crossref, pubmed
+from vdm.author_names import chunk_name, chunk_names
+from vdm.backend import VIVOBackend
+from vdm.catalyst import DisambiguationEngine, STREAM_CHUNK_SIZE, iter_pmids
+from vdm.jsonld import to_graph
+from vdm.namespaces import D
+from vdm.text import normalize
+
+#Names and venues, as they appear in the payloads, for the text stages.
+NAMES = [
+    u"Smith, John D.", u"Müller-Lüdenscheidt, Hans", u"O'Brien, Siobhán",
+    u"Ångström, Anders", u"Nguyễn, Thị Minh", u"García-Márquez, Gabriel",
+    u"Carberry, Josiah S.", u"de la Cruz, María", u"van der Berg, Jan",
+]
+VENUES = [
+    u"The Journal of Pediatrics", u"Proc. Natl. Acad. Sci. U.S.A.",
+    u"Blood\n", u"  Brown   University  ", u"Extremophiles",
+]
+
+
+def pubmed_records():
+    out = []
+    for fname, pmid in [('pubmed_article.json', '23910982'),
+                        ('pubmed_article_unicode.json', '24948623'),
+                        ('pubmed_book.json', None),
+                        ('pubmed_chapter.json', None)]:
+        raw = load(fname)
+        out.append(raw['result'][pmid or raw['result']['uids'][0]])
+    return out
+
+
+def crossref_records():
+    return [
+        load(fname) for fname in
+        ['crossref_article.json', 'crossref_book.json', 'crossref_conf-paper.json']
+    ]
+
+
+def catalyst_payload():
+    with open(os.path.join(DATA_PATH, 'catalyst_pmids.xml'), 'rb') as inf:
+        return inf.read()
+
+
+def bench_pubmed_prep(scale):
+    sources = pubmed_records()
+    count = 2000 * scale
+    records = [sources[n % len(sources)] for n in range(count)]
+    pub = pubmed.Publication()
+
+    def run():
+        for n, meta in enumerate(records):
+            pub.prep(meta, pub_uri=D['pub{0}'.format(n)])
+    return run, count, 'records'
+
+
+def bench_crossref_prep(scale):
+    sources = crossref_records()
+    count = 2000 * scale
+    records = [sources[n % len(sources)] for n in range(count)]
+    pub = crossref.Publication()
+
+    def run():
+        for n, meta in enumerate(records):
+            pub.prep(meta, pub_uri=D['pub{0}'.format(n)])
+    return run, count, 'records'
+
+
+def bench_to_graph(scale):
+    sources = [pubmed.Publication().prep(meta) for meta in pubmed_records()] +\
+        [crossref.Publication().prep(meta) for meta in crossref_records()]
+    count = 2000 * scale
+    records = []
+    for n in range(count):
+        prepped = dict(sources[n % len(sources)])
+        prepped['uri'] = D['pub{0}'.format(n)]
+        prepped['contributor'] = ['fac{0}'.format(n % 100)]
+        records.append(prepped)
+
+    def run():
+        for prepped in records:
+            to_graph(prepped)
+    return run, count, 'records'
+
+
+def bench_normalize(scale):
+    #Uncached, so the cost of normalizing rather than of the lookup.
+    rand = random.Random(1)
+    count = 20000 * scale
+    texts = [
+        u"{0} {1}".format(rand.choice(NAMES + VENUES), n) for n in range(count)
+    ]
+    uncached = normalize.__wrapped__
+
+    def run():
+        for text in texts:
+            uncached(text)
+    return run, count, 'strings'
+
+
+def bench_chunk_name(scale):
+    #Author lists repeat names, as a batch of publications does.
+    rand = random.Random(1)
+    count = 20000 * scale
+    distinct = [u"{0}{1}".format(rand.choice(NAMES), n) for n in range(count // 10)]
+    names = [rand.choice(distinct) for _ in range(count)]
+
+    def run():
+        chunk_name.cache_clear()
+        chunk_names(names)
+    return run, count, 'names'
+
+
+def bench_build_doc(scale):
+    rand = random.Random(1)
+    count = 1000 * scale
+    engine = DisambiguationEngine()
+    engine.affiliation_strings = [u"Brown University", u"Providence"]
+    people = [
+        (u"First{0}".format(n), u"Last{0}".format(n), None,
+         u"fac{0}@school.edu".format(n),
+         [str(rand.randrange(10000000, 27000000)) for _ in range(30)],
+         [str(rand.randrange(10000000, 27000000)) for _ in range(5)])
+        for n in range(count)
+    ]
+
+    def run():
+        for person in people:
+            engine.build_doc(*person)
+    return run, count, 'docs'
+
+
+def bench_iter_pmids(scale):
+    payload = catalyst_payload()
+    count = 200 * scale
+    pmids = len(list(iter_pmids([payload])))
+    chunks = [
+        payload[i:i + STREAM_CHUNK_SIZE]
+        for i in range(0, len(payload), STREAM_CHUNK_SIZE)
+    ]
+
+    def run():
+        for _ in range(count):
+            for _ in iter_pmids(chunks):
+                pass
+    return run, count * pmids, 'pmids'
+
+
+def bench_build_clause(scale):
+    g = faculty_graph(faculty=200 * scale)
+    backend = VIVOBackend('http://localhost/vivo/api/sparqlQuery')
+
+    def run():
+        backend.build_clause(g)
+    return run, len(g), 'triples'
+
+
+#Stages in the order of a load: prep the fetched records, convert to
+#RDF, match names, ask Catalyst and post the update.
+STAGES = [
+    ('pubmed.prep', bench_pubmed_prep),
+    ('crossref.prep', bench_crossref_prep),
+    ('jsonld.to_graph', bench_to_graph),
+    ('text.normalize', bench_normalize),
+    ('author_names.chunk_name', bench_chunk_name),
+    ('catalyst.build_doc', bench_build_doc),
+    ('catalyst.iter_pmids', bench_iter_pmids),
+    ('backend.build_clause', bench_build_clause),
+]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return the stages slower than the baseline by more than the
+    tolerance, a fraction of the baseline throughput.
+    """
+    slower = []
+    for name, rate in sorted(results.items()):
+        base = baseline.get(name)
+        if (base is not None) and (rate < base * (1 - tolerance)):
+            slower.append((name, rate, base))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--stage', action='append', choices=[n for n, _ in STAGES],
+                        help='stage to run, may be repeated, default all')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiply the input sizes')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write throughput per stage to a JSON file')
+    parser.add_argument('--baseline', help='JSON file from an earlier --save')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown from the baseline, default 0.2')
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in STAGES:
+        if (args.stage is not None) and (name not in args.stage):
+            continue
+        run, count, unit = setup(args.scale)
+        seconds = timed(run, repeat=args.repeat)
+        report(name, seconds, count, unit)
+        results[name] = count / seconds
+
+    if args.save is not None:
+        with open(args.save, 'w') as outf:
+            json.dump(results, outf, indent=2, sort_keys=True)
+    if args.baseline is not None:
+        with open(args.baseline) as inf:
+            baseline = json.load(inf)
+        slower = compare(results, baseline, args.tolerance)
+        for name, rate, base in slower:
+            print(u"SLOWER {0}: {1:.0f}/s, baseline {2:.0f}/s".format(name, rate, base))
+        if slower != []:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
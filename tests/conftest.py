@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+from vdm import cache
+from vdm.cache import SQLiteCache
+
+
+@pytest.fixture
+def store(tmp_path):
+    c = SQLiteCache(os.path.join(str(tmp_path), 'vdm.sqlite'))
+    cache.set_cache(c)
+    yield c
+    cache.set_cache(None)
@@ -1,6 +1,14 @@
 import unittest
 
-from vdm.author_names import Author, catalyst_match, chunk_name
+from vdm.author_names import (
+    Author,
+    AuthorRoster,
+    build_blocks,
+    catalyst_match,
+    chunk_name,
+    chunk_names,
+    match_many,
+)
 
 fac_1 = f = Author(
     #uri=u'http://example.org/fac1',
@@ -77,9 +85,101 @@ class TestCatalystMatch(unittest.TestCase):
 
 class TestChunkWokName(unittest.TestCase):
 
+    def test_cached(self):
+        chunk_name.cache_clear()
+        names = [u"J. D. Smith", u"G M Weber", u"J. D. Smith", u"J. D. Smith"]
+        authors = chunk_names(names)
+        assert [au.last for au in authors] == [u"smith", u"weber", u"smith", u"smith"]
+        #Duplicates are parsed once.
+        assert authors[0] is authors[2]
+        info = chunk_name.cache_info()
+        assert info.misses == 2
+        assert info.hits == 0
+        chunk_name(u"G M Weber")
+        assert chunk_name.cache_info().hits == 1
+
     def test_first_middle_last(self):
         nm = u"Jonathan D. Smith"
         au = chunk_name(nm)
         assert au.first == u"jonathan"
         assert au.middle == u"d"
-        assert au.last == u"smith"
\ No newline at end of file
+        assert au.last == u"smith"
+
+#Author with only a last name.
+no_first = Author(
+    full=u'smith',
+    last=u'smith',
+    first=u'',
+    first_initial=None,
+    middle=None,
+    middle_initial=None
+)
+
+
+class TestMatchMany(unittest.TestCase):
+
+    def test_same_as_pairwise(self):
+        candidates = [chunk_name(n) for n in [
+            u"J. D. Smith",
+            u"John David Smith",
+            u"Jonathan D. Smith",
+            u"G M Weber",
+            u"G T Weber",
+            u"Griffin Weber",
+        ]] + [no_first]
+        roster = [fac_1, fac_2, chunk_name(u"Jonathan Dean Smith")]
+        pairwise = [
+            (cand, au)
+            for cand in candidates
+            for au in roster
+            if cand.first and catalyst_match(cand, au)
+        ]
+        matches = match_many(candidates, roster)
+        assert matches == pairwise
+        assert (candidates[0], fac_1) in matches
+        assert (candidates[2], roster[2]) in matches
+        assert (candidates[4], fac_2) not in matches
+
+    def test_blocks(self):
+        blocks = build_blocks([fac_1, fac_2, no_first])
+        assert blocks == {('smith', 'j'): [fac_1], ('weber', 'g'): [fac_2]}
+
+
+class TestAuthorRoster(unittest.TestCase):
+
+    def setUp(self):
+        self.authors = [
+            fac_1,
+            fac_2,
+            chunk_name(u"Jonathan Dean Smith"),
+            no_first,
+            chunk_name(u"John Smith"),
+        ]
+        self.roster = AuthorRoster(self.authors)
+
+    def test_rows(self):
+        assert len(self.roster) == 5
+        assert list(self.roster) == self.authors
+        assert self.roster[3] == no_first
+        #Shared strings are stored once.
+        assert self.roster.strings.count(u'smith') == 1
+
+    def test_index(self):
+        assert self.roster[-1] == self.authors[-1]
+        assert self.roster[-5] == self.authors[0]
+        for row in [5, -6]:
+            with self.assertRaises(IndexError):
+                self.roster[row]
+
+    def test_match(self):
+        assert self.roster.block(chunk_name(u"J. Smith")) == [0, 2, 4]
+        assert self.roster.match(chunk_name(u"J. D. Smith")) == [0, 2]
+        assert self.roster.match(chunk_name(u"Jane Doe")) == []
+        candidates = [chunk_name(n) for n in [
+            u"J. D. Smith",
+            u"John Smith",
+            u"G T Weber",
+            u"Griffin Weber",
+        ]]
+        assert match_many(candidates, self.roster) ==\
+            match_many(candidates, self.authors)
@@ -4,10 +4,13 @@ Tests for commond Graph manipulations.
 Todo - load RDF into base backend to test add/remove features.
 """
 
+from urllib.parse import parse_qs
+
+import responses
 from rdflib import URIRef, Graph, RDF, RDFS, Literal
 from rdflib.compare import similar
 
-from vdm.backend import BaseBackend
+from vdm.backend import BaseBackend, VIVOBackend
 from vdm.namespaces import D, FOAF, VIVO
 from vdm.namespaces import ns_mgr
 
@@ -79,3 +82,107 @@ def test_create_resource():
     uri, g = base.create_resource('foaf:Person', name, uri=assigned_uri)
     assert(uri == assigned_uri)
 
+
+
+class RecordingBackend(VIVOBackend):
+    """
+    Backend that records updates rather than posting them.
+    """
+
+    def __init__(self, fail=False):
+        VIVOBackend.__init__(self, 'http://localhost/sparql')
+        self.updates = []
+        self.fail = fail
+
+    def do_update(self, query):
+        self.updates.append(query)
+        if self.fail is True:
+            raise Exception("Update failed.")
+
+
+def test_batch_writer():
+    backend = RecordingBackend()
+    with backend.batch(max_triples=4) as writer:
+        for n in range(5):
+            add_g = Graph()
+            add_g.add((D['n%d' % n], RDFS.label, Literal('new %d' % n)))
+            subtract_g = Graph()
+            subtract_g.add((D['n%d' % n], RDFS.label, Literal('old %d' % n)))
+            writer.add_remove(add_g, subtract_g)
+        #Empty edits are skipped.
+        writer.add_remove(Graph(), Graph())
+    #Two edits per request and the remainder sent on exit.
+    assert len(backend.updates) == 3
+    assert writer.requests == 3
+    assert writer.failures == []
+    first = backend.updates[0]
+    assert first.count('INSERT DATA') == 2
+    assert first.count('DELETE DATA') == 2
+    #Operations keep the order of the edits.
+    assert first.index('"new 0"') < first.index('"old 0"') < first.index('"new 1"')
+    assert '"new 4"' in backend.updates[2]
+
+
+def test_batch_writer_failures():
+    backend = RecordingBackend(fail=True)
+    writer = backend.batch(max_triples=10)
+    add_g = Graph()
+    add_g.add((D['n1'], RDFS.label, Literal('new')))
+    writer.add_remove(add_g, Graph())
+    assert backend.updates == []
+    assert writer.flush() is False
+    assert len(writer.failures) == 1
+    failed = writer.failures[0]
+    assert failed.edits[0][0] is add_g
+    assert str(failed.error) == "Update failed."
+
+
+def test_iter_clause():
+    backend = RecordingBackend()
+    g = Graph()
+    g.add((D['n1'], RDFS.label, Literal('one')))
+    g.add((D['n1'], RDF.type, FOAF.Person))
+    clause = backend.build_clause(g)
+    assert clause == u"".join(backend.iter_clause(g))
+    assert clause.startswith(u"INSERT DATA { GRAPH <%s> { " % backend.default_graph)
+    assert clause.endswith(u" } }")
+    assert u'<%s> <%s> "one" .\n' % (D['n1'], RDFS.label) in clause
+    delete = backend.build_clause(g, name='http://localhost/g', delete=True)
+    assert delete.startswith(u"DELETE DATA { GRAPH <http://localhost/g> { ")
+
+
+@responses.activate
+def test_stream_add_remove(monkeypatch):
+    monkeypatch.setenv('VIVO_URL', 'http://localhost/vivo')
+    monkeypatch.setenv('VIVO_USER', 'vivo@example.org')
+    monkeypatch.setenv('VIVO_PASSWORD', 'secret')
+    received = []
+
+    def update(request):
+        body = request.body
+        if not isinstance(body, bytes):
+            body = b"".join(body)
+        received.append(parse_qs(body.decode('ascii')))
+        return (200, {}, '')
+
+    responses.add_callback(
+        responses.POST,
+        'http://localhost/vivo/api/sparqlUpdate',
+        callback=update
+    )
+    backend = RecordingBackend()
+    add_g = Graph()
+    for n in range(100):
+        add_g.add((D['n%d' % n], RDFS.label, Literal(u'Label & "quoted" %d' % n)))
+    subtract_g = Graph()
+    subtract_g.add((D['n1'], RDFS.label, Literal(u'old')))
+    #Small chunks so the body is sent in pieces.
+    chunks = list(backend.iter_form_body(backend.iter_update(add_g, subtract_g), chunk_size=512))
+    assert len(chunks) > 1
+    assert backend.stream_add_remove(add_g, subtract_g) is True
+    form = received[0]
+    assert form['email'] == ['vivo@example.org']
+    assert form['password'] == ['secret']
+    expected = backend.build_clause(add_g) + u" ;\n" +\
+        backend.build_clause(subtract_g, delete=True)
+    assert form['update'] == [expected]
@@ -0,0 +1,123 @@
+import json
+import time
+
+import responses
+
+from .tutils import load
+
+from vdm import cache
+
+
+def test_set_get(store):
+    assert store.get('citeproc', '10.1234') is None
+    store.set('citeproc', '10.1234', '{}', etag='"abc"')
+    entry = store.get('citeproc', '10.1234')
+    assert entry.value == '{}'
+    assert entry.etag == '"abc"'
+    assert entry.expires > time.time()
+    store.delete('citeproc', '10.1234')
+    assert store.get('citeproc', '10.1234') is None
+
+
+def test_eviction(store):
+    store.max_entries = 3
+    for n in range(3):
+        store.set('esummary', str(n), 'value')
+    #Reading keeps an entry recently used.
+    time.sleep(0.01)
+    store.get('esummary', '0')
+    store.set('esummary', '3', 'value')
+    assert len(store) == 3
+    assert store.get('esummary', '0') is not None
+    assert store.get('esummary', '1') is None
+
+
+@responses.activate
+def test_citeproc_cached(store):
+    from vdm.crossref import get_citeproc
+    doi = '10.1016/j.jpeds.2013.06.032'
+    responses.add(
+        responses.GET,
+        'http://dx.doi.org/' + doi,
+        body=json.dumps(load('crossref_article.json')),
+        content_type='application/json'
+    )
+    first = get_citeproc(doi)
+    #Cache keys are normalized.
+    second = get_citeproc('http://dx.doi.org/' + doi.upper())
+    assert first == second
+    assert first['DOI'].lower() == doi
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_revalidate(store):
+    url = 'http://example.org/record'
+    store.ttl = -1
+    responses.add(responses.GET, url, body='original',
+                  headers={'ETag': '"v1"'})
+    assert cache.cached_get('test', 'record', url) == 'original'
+    responses.reset()
+    responses.add(responses.GET, url, status=304)
+    assert cache.cached_get('test', 'record', url) == 'original'
+    assert responses.calls[0].request.headers['If-None-Match'] == '"v1"'
+
+
+@responses.activate
+def test_fetch_many_cached(store):
+    from vdm.pubmed import Publication, ESUMMARY_URL
+    responses.add(
+        responses.GET,
+        ESUMMARY_URL.split('?')[0],
+        body=json.dumps(load('pubmed_article.json')),
+        content_type='application/json'
+    )
+    pub = Publication()
+    found, errors = pub.fetch_many(['23910982'])
+    assert errors == {}
+    #Single fetch reads the entry stored by the batch fetch.
+    meta = pub.fetch('23910982')
+    assert meta == found['23910982']
+    assert len(responses.calls) == 1
+
+
+def test_reads_dont_write(store):
+    store.set('esummary', '1', 'value')
+    changes = store.conn.total_changes
+    for _ in range(10):
+        assert store.get('esummary', '1').value == 'value'
+    assert store.conn.total_changes == changes
+    store.flush()
+    assert store.conn.total_changes == changes + 1
+
+
+def test_replace_and_delete_counted(store):
+    #Replacing an entry doesn't count towards max_entries.
+    store.max_entries = 3
+    for n in range(3):
+        store.set('esummary', str(n), 'value')
+    for _ in range(3):
+        store.set('esummary', '2', 'new')
+    assert len(store) == 3
+    assert store.get('esummary', '0') is not None
+    store.delete('esummary', '0')
+    store.set('esummary', '3', 'value')
+    assert len(store) == 3
+    assert store.get('esummary', '1') is not None
+
+
+@responses.activate
+def test_errors_not_cached(store):
+    from vdm.pubmed import Publication, ESUMMARY_URL
+    error = {'result': {'uids': ['1'], '1': {'uid': '1', 'error': 'cannot get document summary'}}}
+    responses.add(
+        responses.GET,
+        ESUMMARY_URL.split('?')[0],
+        body=json.dumps(error),
+        content_type='application/json'
+    )
+    pub = Publication()
+    pub.fetch('1')
+    pub.fetch('1')
+    assert len(responses.calls) == 2
+    assert len(store) == 0
@@ -1,8 +1,17 @@
+import json
+import os
+
 import pytest
-from vdm.catalyst import DisambiguationEngine
+import requests
+import responses
+
+from vdm.catalyst import DisambiguationEngine, DisambiguationRunner,\
+    SERVICE_URL, disambiguate_many, iter_pmids
 
 from vdm.utils import get_env
 
+from .tutils import DATA_PATH
+
 try:
     get_env('TRAVIS')
     TRAVIS = True
@@ -152,3 +161,109 @@ def test_prep_returned_list():
         ==\
         ['11707567', '12209713']
     )
+
+
+def test_iter_pmids():
+    raw = b'<PMIDList><PMID>11707567</PMID><PMID>12209713</PMID></PMIDList>'
+    #Chunks split mid element.
+    chunks = [raw[n:n + 7] for n in range(0, len(raw), 7)]
+    assert list(iter_pmids(chunks)) == ['11707567', '12209713']
+
+
+def test_synthetic_response():
+    #Generated PMIDs in the service's response format, replayed by
+    #the benchmark suite.
+    with open(os.path.join(DATA_PATH, 'catalyst_pmids.xml'), 'rb') as inf:
+        raw = inf.read()
+    engine = DisambiguationEngine()
+    pmids = engine.prep_returned_list(raw)
+    assert len(pmids) == 250
+    assert engine.clean_pubs(pmids) == pmids
+
+
+ROSTER = [
+    ('Josiah', 'Carberry', None, 'jcarberry@brown.edu', ['12345678'], []),
+    ('Jane', 'Doe', 'Q', 'jdoe@brown.edu', ['23456789'], ['34567890']),
+    #No known publications so build_doc fails.
+    ('John', 'Roe', None, None, [], []),
+]
+
+
+def echo_known(request):
+    #Reply with the known PMIDs from the posted doc.
+    body = request.body
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    start = body.index('<PMIDAddList>')
+    end = body.index('</PMIDAddList>')
+    reply = '<PMIDList>' + body[start + len('<PMIDAddList>'):end] + '</PMIDList>'
+    return (200, {}, reply)
+
+
+@responses.activate
+def test_runner(tmp_path):
+    responses.add_callback(responses.POST, SERVICE_URL, callback=echo_known)
+    progress = str(tmp_path / 'progress.jsonl')
+    results, errors = disambiguate_many(ROSTER, workers=2, progress_path=progress)
+    assert results == {
+        'jcarberry@brown.edu': ['12345678'],
+        'jdoe@brown.edu': ['23456789'],
+    }
+    assert list(errors.keys()) == ['John Roe']
+    assert len(responses.calls) == 2
+    with open(progress) as inf:
+        lines = [json.loads(line) for line in inf]
+    assert len(lines) == 3
+
+    #A second run only retries the failure.
+    runner = DisambiguationRunner(workers=2, progress_path=progress)
+    results = runner.run(ROSTER + [
+        ('Ann', 'Smith', None, 'asmith@brown.edu', ['45678901'], []),
+    ])
+    assert len(responses.calls) == 3
+    assert results['asmith@brown.edu'] == ['45678901']
+    assert results['jcarberry@brown.edu'] == ['12345678']
+    assert list(runner.errors.keys()) == ['John Roe']
+
+
+@responses.activate
+def test_do_cached(store):
+    responses.add_callback(responses.POST, SERVICE_URL, callback=echo_known)
+    p = ['Jane', 'Doe', 'Q', 'jdoe@brown.edu', ['23456789', '12345678'], []]
+    disambig = DisambiguationEngine()
+    assert disambig.do(*p) == ['12345678', '23456789']
+    assert len(responses.calls) == 1
+
+    #Same inputs in a different order.
+    p[4] = ['12345678', '23456789', '12345678']
+    assert disambig.do(*p) == ['12345678', '23456789']
+    assert len(responses.calls) == 1
+
+    #Changed settings are posted again.
+    disambig.threshold_score = '0.9'
+    disambig.do(*p)
+    assert len(responses.calls) == 2
+
+    #As are expired results.
+    store.ttl = -1
+    p[4] = ['12345678']
+    disambig.do(*p)
+    disambig.do(*p)
+    assert len(responses.calls) == 4
+
+
+@responses.activate
+def test_do_error_not_cached(store):
+    #An error page that parses as an empty list.
+    responses.add(responses.POST, SERVICE_URL, body='<PMIDList/>', status=500)
+    p = ['Jane', 'Doe', 'Q', 'jdoe@brown.edu', ['23456789'], []]
+    disambig = DisambiguationEngine()
+    with pytest.raises(requests.HTTPError):
+        disambig.do(*p)
+    assert len(store) == 0
+
+    #A later success is posted and cached.
+    responses.replace(responses.POST, SERVICE_URL, body='<PMIDList><PMID>23456789</PMID></PMIDList>')
+    assert disambig.do(*p) == ['23456789']
+    assert len(store) == 1
+    assert len(responses.calls) == 2
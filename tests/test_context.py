@@ -0,0 +1,36 @@
+import pickle
+
+import pytest
+
+from .tutils import load
+
+from vdm import context, crossref, pubmed
+from vdm.context import FrozenContext
+
+
+def test_frozen():
+    c = context.publication_context
+    assert c['title'] == 'rdfs:label'
+    assert c['bcite'] == context.base['bcite']
+    with pytest.raises(TypeError):
+        c['title'] = 'dcterms:title'
+    with pytest.raises(TypeError):
+        c.update({'title': 'dcterms:title'})
+    with pytest.raises(TypeError):
+        c['date']['@type'] = 'xsd:string'
+    changed = dict(c, title='dcterms:title')
+    assert changed['title'] == 'dcterms:title'
+    assert pickle.loads(pickle.dumps(c)) == c
+
+
+def test_processed():
+    c = FrozenContext(context.base, **context.delegate)
+    assert c.processed() is c.processed()
+    assert c.processed().expand('first') == 'http://xmlns.com/foaf/0.1/firstName'
+
+
+def test_shared():
+    pm = pubmed.Publication().prep(load('pubmed_article.json')['result']['23910982'])
+    cr = crossref.Publication().prep(load('crossref_article.json'))
+    assert pm['@context'] is context.publication_context
+    assert cr['@context'] is context.publication_context
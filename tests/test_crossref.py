@@ -217,3 +217,43 @@ def test_by_openurl():
     title, doi = by_openurl(p, 'noreply@example.org')
     assert doi == '10.1007/s00792-014-0663-8'
     assert title.startswith('Transposon mutagenesis')
+
+
+def test_parse_openurl():
+    from vdm.crossref import parse_openurl
+    raw = CROSSREF_OPENURL_RESPONSE.encode('utf-8')
+    chunks = [raw[n:n + 100] for n in range(0, len(raw), 100)]
+    title, doi = parse_openurl(chunks)
+    assert doi == '10.1007/s00792-014-0663-8'
+    assert title.startswith('Transposon mutagenesis')
+    assert parse_openurl([b'<doi_records></doi_records>']) == (None, None)
+
+
+def test_parse_openurl_discards(monkeypatch):
+    from vdm import crossref, utils
+    roots = []
+
+    def recording(chunks, events=('end',)):
+        for event, elem in utils.iterparse_chunks(chunks, events=events):
+            if not roots:
+                roots.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(crossref, 'iterparse_chunks', recording)
+    record = b'<doi_record><crossref><journal><journal_metadata>' +\
+        b'<full_title>J</full_title></journal_metadata></journal></crossref></doi_record>'
+    raw = b'<doi_records>' + record * 500 + b'</doi_records>'
+    assert crossref.parse_openurl([raw]) == (None, None)
+    #Finished records aren't kept in the tree.
+    assert len(roots[0]) == 0
+
+
+@responses.activate
+def test_by_openurl_parse_error():
+    responses.add(responses.GET, 'http://crossref.org/openurl/',
+                  body='<doi_records><doi_record>',
+                  status=200,
+                  content_type='text/xml'
+                )
+    from vdm.crossref import by_openurl
+    assert by_openurl({'issn': '1431-0651'}, 'noreply@example.org') is None
@@ -0,0 +1,147 @@
+import asyncio
+import json
+
+import pytest
+import responses
+
+from .tutils import load
+
+from vdm.harvest import Harvester, RateLimiter, classify, harvest, limited_retry
+from vdm.pubmed import ESUMMARY_URL
+
+
+def test_classify():
+    assert classify('10.1016/j.jpeds.2013.06.032') == ('doi', '10.1016/j.jpeds.2013.06.032')
+    assert classify('doi:10.1234/ABC') == ('doi', '10.1234/abc')
+    assert classify('23910982') == ('pmid', '23910982')
+    assert classify(23910982) == ('pmid', '23910982')
+    assert classify('PMC1234') == (None, 'PMC1234')
+    assert classify('PMID: 23910982') == ('pmid', '23910982')
+    assert classify('pmid:23910982') == ('pmid', '23910982')
+
+
+@pytest.mark.parametrize('value', [
+    'https://doi.org/10.1016/j.jpeds.2013.06.032',
+    'https://dx.doi.org/10.1016/j.jpeds.2013.06.032',
+    'http://doi.org/10.1016/J.JPEDS.2013.06.032',
+    'http://dx.doi.org/10.1016/j.jpeds.2013.06.032',
+    'doi.org/10.1016/j.jpeds.2013.06.032',
+    'doi: 10.1016/j.jpeds.2013.06.032',
+])
+def test_classify_doi_urls(value):
+    assert classify(value) == ('doi', '10.1016/j.jpeds.2013.06.032')
+
+
+@pytest.mark.parametrize('value', [
+    'https://example.org/10.1016/x',
+    'ISBN 1234567890',
+    'PMID 12',
+    '23910982a',
+    '0123',
+])
+def test_classify_unrecognized(value):
+    assert classify(value) == (None, value)
+
+
+@responses.activate
+def test_harvest():
+    pmid = '23910982'
+    doi = '10.1016/j.jpeds.2013.06.032'
+    responses.add(
+        responses.GET,
+        ESUMMARY_URL.split('?')[0],
+        body=json.dumps(load('pubmed_article.json')),
+        content_type='application/json'
+    )
+    responses.add(
+        responses.GET,
+        'http://dx.doi.org/' + doi,
+        body=json.dumps(load('crossref_article.json')),
+        content_type='application/json'
+    )
+    responses.add(
+        responses.GET,
+        'http://dx.doi.org/10.1234/missing',
+        body='Resource not found.',
+        status=404
+    )
+    prepped, errors = harvest(
+        [pmid, doi, '10.1234/missing', 'PMC1234'],
+        concurrency=2,
+        ncbi_rate=100,
+        crossref_rate=100
+    )
+    assert sorted(p.get('pmid') or p.get('doi') for p in prepped)\
+        == [doi, pmid]
+    for p in prepped:
+        assert '@context' in p
+    assert sorted(errors.keys()) == ['10.1234/missing', 'PMC1234']
+
+
+def esummary(request):
+    #Reply with the article for each requested PMID.
+    article = load('pubmed_article.json')['result']['23910982']
+    pmids = request.url.split('id=')[1].split('&')[0].split(',')
+    result = {'uids': pmids}
+    for pmid in pmids:
+        if pmid != '99999999':
+            result[pmid] = dict(article, uid=pmid)
+    return (200, {}, json.dumps({'result': result}))
+
+
+@responses.activate
+def test_harvest_batches():
+    responses.add_callback(responses.GET, ESUMMARY_URL.split('?')[0], callback=esummary)
+    prepped, errors = harvest(
+        ['23910982', '12345678', 'PMID: 24948623', '99999999', '23910982'],
+        concurrency=2,
+        ncbi_rate=100,
+        batch_size=2
+    )
+    assert len(responses.calls) == 2
+    assert len(prepped) == 3
+    assert list(errors.keys()) == ['99999999']
+
+
+@responses.activate
+def test_harvest_stopped_early():
+    responses.add(
+        responses.GET,
+        'http://dx.doi.org/10.1016/j.jpeds.2013.06.032',
+        body=json.dumps(load('crossref_article.json')),
+        content_type='application/json'
+    )
+    harvester = Harvester(concurrency=1, crossref_rate=100)
+
+    async def first():
+        gen = harvester.harvest(['10.1016/j.jpeds.2013.06.032'] * 10)
+        async for prepped in gen:
+            break
+        await gen.aclose()
+        return prepped
+
+    assert asyncio.run(first())['doi'] == '10.1016/j.jpeds.2013.06.032'
+    #The remaining lookups are cancelled rather than failed.
+    assert len(responses.calls) < 10
+    assert harvester.errors == {}
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(10)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_limited_retry():
+    class Limiter:
+        blocked = 0
+
+        def block(self):
+            self.blocked += 1
+
+    limiter = Limiter()
+    retry = limited_retry(limiter)(total=2, backoff_factor=0)
+    #Each attempt is a new instance of the class.
+    retry = retry.new(total=1)
+    retry.sleep()
+    assert limiter.blocked == 1
@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = [
+    'rdflib',
+    'rdflib.plugins.sparql',
+    'rdflib.plugins.parsers.jsonld',
+    'SPARQLWrapper',
+    'requests',
+    'bleach',
+    'nameparser',
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def loaded_after(statement):
+    """
+    Heavy modules loaded after running the import statement in a
+    fresh interpreter.
+    """
+    code = "import sys, json\n{0}\nprint(json.dumps([m for m in {1!r} if m in sys.modules]))".format(
+        statement, HEAVY
+    )
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', [
+    'vdm', 'vdm.utils', 'vdm.context', 'vdm.session', 'vdm.cache',
+    'vdm.catalyst', 'vdm.crossref', 'vdm.pubmed', 'vdm.text',
+    'vdm.author_names', 'vdm.harvest',
+])
+def test_light(module):
+    assert loaded_after("import {0}".format(module)) == []
+
+
+@pytest.mark.parametrize('module', ['vdm.backend', 'vdm.models'])
+def test_deferred(module):
+    assert loaded_after("import {0}".format(module)) == ['rdflib']
+
+
+def test_namespace_tables():
+    assert loaded_after(
+        "import vdm.namespaces as n\n"
+        "assert 'ns_mgr' not in vars(n)\n"
+        "assert n.ns_mgr is n.ns_mgr\n"
+        "assert 'prefix bcite:' in n.rq_prefixes\n"
+        "import vdm.context as c\n"
+        "assert c.base['@base'] == str(n.D)"
+    ) == ['rdflib']
+
+
+def test_no_logging_config():
+    assert loaded_after(
+        "import logging\n"
+        "import vdm.crossref\n"
+        "assert logging.getLogger().handlers == []\n"
+        "assert logging.getLogger().level == logging.WARNING\n"
+        "assert vdm.crossref.logger.name == 'vdm.crossref'"
+    ) == []
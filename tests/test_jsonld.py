@@ -0,0 +1,123 @@
+import datetime
+
+import pytest
+
+from rdflib import Graph, URIRef
+from rdflib.compare import isomorphic
+from rdflib.plugins.parsers.jsonld import to_rdf
+
+from .tutils import load
+
+from vdm import crossref, jsonld, pubmed
+from vdm.jsonld import PUBLICATION, to_graph
+from vdm.namespaces import D
+
+
+@pytest.fixture
+def no_fallback(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("to_rdf used")
+    monkeypatch.setattr(jsonld, 'to_rdf', fail)
+
+
+def assert_same(prepped):
+    expected = to_rdf(prepped, Graph())
+    g = to_graph(prepped)
+    assert isomorphic(g, expected)
+    assert sorted(g.namespaces()) == sorted(expected.namespaces())
+    return g
+
+
+PUBMED = [
+    ('pubmed_article.json', '23910982'),
+    ('pubmed_article_unicode.json', '24948623'),
+    ('pubmed_book.json', None),
+    ('pubmed_chapter.json', None),
+]
+
+CROSSREF = [
+    'crossref_article.json',
+    'crossref_book.json',
+    'crossref_conf-paper.json',
+]
+
+OPTIONS = [
+    {},
+    {'pub_uri': D['n123'], 'venue_uri': D['v123']},
+    {'pub_uri': 'n123', 'contributors': ['jsmith', D['jjones']]},
+]
+
+
+@pytest.mark.parametrize('fname,pmid', PUBMED)
+@pytest.mark.parametrize('options', OPTIONS)
+def test_pubmed(fname, pmid, options, no_fallback):
+    raw = load(fname)
+    meta = raw['result'][pmid or raw['result']['uids'][0]]
+    prepped = pubmed.Publication().prep(meta, **options)
+    assert len(assert_same(prepped)) > 0
+
+
+@pytest.mark.parametrize('fname', CROSSREF)
+@pytest.mark.parametrize('options', OPTIONS)
+def test_crossref(fname, options, no_fallback):
+    prepped = crossref.Publication().prep(load(fname), **options)
+    assert len(assert_same(prepped)) > 0
+
+
+def sample():
+    return {
+        'uri': 'n1',
+        'a': ['bcite:Article', 'http://example.org/Thing'],
+        'title': u'A title é',
+        'volume': 12,
+        'pages': 1.5,
+        'issue': True,
+        'date': datetime.date(2015, 2, 1),
+        'pmid': None,
+        'isbn': '1234',
+        'bcite:extra': 'extra',
+        'contributor': ['_:b1', 'http://example.org/p', 'p2', None],
+        'venue': {'label': 'Venue', 'a': 'bcite:Venue'},
+        'url': [u'http://a.org', u'http://b.org'],
+        '@context': PUBLICATION.data,
+    }
+
+
+@pytest.mark.parametrize('change', [
+    {},
+    {'uri': None},
+    {'uri': '_:pub'},
+    {'uri': 'has space'},
+    {'venue': {'uri': 'v1', 'issn': '1234-5678'}},
+    {'venue': 'v2'},
+    {'date': '2015-02-01'},
+])
+def test_emitted(change, no_fallback):
+    prepped = sample()
+    prepped.update(change)
+    assert_same(prepped)
+
+
+@pytest.mark.parametrize('change', [
+    {'contributor': ['has space']},
+    {'@type': 'bcite:Book'},
+    {'@id': 'n2'},
+    {'venue': {'@value': 'v'}},
+    {'title': {'@value': 'T', '@language': 'en'}},
+    {'venue': {'label': 'V', '@context': {'label': 'bcite:label'}}},
+    {'@context': {'title': 'http://purl.org/dc/terms/title', 'uri': '@id'}},
+    {'@context': dict(PUBLICATION.data, **{'@language': 'en'})},
+    {'@context': dict(PUBLICATION.data, authors={'@id': 'bcite:authorList', '@container': '@list'})},
+])
+def test_fallback(change):
+    prepped = sample()
+    prepped.update(change)
+    assert_same(prepped)
+
+
+def test_contributors():
+    prepped = sample()
+    g = to_graph(prepped)
+    contrib = set(g.objects(D['n1'], URIRef('http://vivo.brown.edu/ontology/citation#hasContributor')))
+    assert URIRef('http://example.org/p') in contrib
+    assert D['p2'] in contrib
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+import responses
+
+from rdflib import Graph, Literal, RDFS
+
+from vdm import cache, metrics
+from vdm.backend import VIVOBackend
+from vdm.cache import SQLiteCache
+from vdm.models import VResource
+from vdm.namespaces import D
+from vdm import session
+
+
+@pytest.fixture
+def collector():
+    c = metrics.Collector(buckets=(0.1, 1.0))
+    metrics.set_collector(c)
+    yield c
+    metrics.set_collector(None)
+
+
+def test_disabled():
+    assert metrics.get_collector() is None
+    metrics.inc('vdm_test_total')
+    with metrics.timer('vdm_test_seconds'):
+        pass
+    assert metrics.prometheus_text() == u""
+
+
+def test_prometheus_text(collector, tmp_path):
+    collector.inc('vdm_test_total', 2, {'host': 'a"b'})
+    collector.inc('vdm_test_total', 1, {'host': 'a"b'})
+    collector.observe('vdm_test_seconds', 0.05)
+    collector.observe('vdm_test_seconds', 0.5)
+    collector.observe('vdm_test_seconds', 5)
+    expected = u"\n".join([
+        u'# TYPE vdm_test_total counter',
+        u'vdm_test_total{host="a\\"b"} 3',
+        u'# TYPE vdm_test_seconds histogram',
+        u'vdm_test_seconds_bucket{le="0.1"} 1',
+        u'vdm_test_seconds_bucket{le="1.0"} 2',
+        u'vdm_test_seconds_bucket{le="+Inf"} 3',
+        u'vdm_test_seconds_sum 5.55',
+        u'vdm_test_seconds_count 3',
+    ]) + u"\n"
+    assert metrics.prometheus_text() == expected
+    path = os.path.join(str(tmp_path), 'vdm.prom')
+    metrics.write_prometheus(path)
+    with open(path) as inf:
+        assert inf.read() == expected
+
+
+@responses.activate
+def test_requests(collector, tmp_path):
+    responses.add(responses.GET, 'http://example.org/a', body='12345')
+    responses.add(responses.POST, 'http://example.org/b', body='', status=500)
+    session.get('http://example.org/a')
+    session.post('http://example.org/b', data='abc')
+    host = 'example.org'
+    assert collector.counter('vdm_http_requests_total', host=host, method='GET', status=200) == 1
+    assert collector.counter('vdm_http_requests_total', host=host, method='POST', status=500) == 1
+    assert collector.counter('vdm_http_response_bytes_total', host=host) == 5
+    assert collector.counter('vdm_http_request_bytes_total', host=host) == 3
+    assert collector.histogram_count('vdm_http_request_seconds', host=host) == 2
+
+    cache.set_cache(SQLiteCache(os.path.join(str(tmp_path), 'vdm.sqlite')))
+    try:
+        cache.cached_get('test', 'a', 'http://example.org/a')
+        cache.cached_get('test', 'a', 'http://example.org/a')
+    finally:
+        cache.set_cache(None)
+    assert collector.counter('vdm_cache_requests_total', namespace='test', result='miss') == 1
+    assert collector.counter('vdm_cache_requests_total', namespace='test', result='hit') == 1
+
+
+class Labeled(VResource):
+
+    def init_query(self):
+        return u"""
+        CONSTRUCT { ?subject rdfs:label ?label }
+        WHERE { ?subject rdfs:label ?label }
+        """
+
+
+def test_init_graph(collector):
+    store = Graph()
+    store.add((D['n1'], RDFS.label, Literal(u'One')))
+    Labeled(uri=D['n1'], store=store)
+    assert collector.counter('vdm_sparql_queries_total', store='local') == 1
+    assert collector.histogram_count('vdm_sparql_query_seconds', store='local') == 1
+
+
+@responses.activate
+def test_update(collector, monkeypatch):
+    monkeypatch.setenv('VIVO_URL', 'http://localhost/vivo')
+    monkeypatch.setenv('VIVO_USER', 'vivo@example.org')
+    monkeypatch.setenv('VIVO_PASSWORD', 'secret')
+    responses.add(responses.POST, 'http://localhost/vivo/api/sparqlUpdate', body='')
+    backend = VIVOBackend.__new__(VIVOBackend)
+    backend.default_graph = 'http://localhost/g'
+    backend.listeners = []
+    g = Graph()
+    g.add((D['n1'], RDFS.label, Literal(u'One')))
+    backend.stream_add_remove(g, Graph())
+    responses.replace(responses.POST, 'http://localhost/vivo/api/sparqlUpdate', body='', status=500)
+    with pytest.raises(Exception):
+        backend.stream_add_remove(g, Graph())
+    assert collector.counter('vdm_sparql_updates_total', result='ok') == 1
+    assert collector.counter('vdm_sparql_updates_total', result='error') == 1
+    assert collector.histogram_count('vdm_sparql_update_seconds') == 2
@@ -1,9 +1,10 @@
 
-from rdflib import Literal, RDF, RDFS
-from vdm.namespaces import D, FOAF
+from rdflib import Graph, Literal, RDF, RDFS
+from rdflib.compare import isomorphic
+from vdm.namespaces import D, FOAF, VIVO, BLOCAL
 
-from vdm.backend import work_graph
-from vdm.models import VResource, Person, FacultyMember
+from vdm.backend import FusekiGraph, VIVOBackend, work_graph
+from vdm.models import BaseResource, VResource, Person, FacultyMember, ResourceCache
 
 
 class TestResource:
@@ -42,6 +43,34 @@ class TestResource:
         assert name.toPython() in [r['label'] for r in related]
 
 
+    def test_index(self):
+        g = work_graph()
+        g += [
+            (self.uri, RDFS.label, self.name),
+            (self.uri, FOAF.knows, D['bob']),
+            (D['bob'], RDFS.label, Literal(u"Jones, Bob")),
+        ]
+        res = BaseResource(uri=self.uri, graph=g)
+        assert res.get_related(FOAF.knows) ==\
+            [{'uri': D['bob'].toPython(), 'label': u"Jones, Bob"}]
+        assert res.get_literals(FOAF.name) == []
+        assert res.get_first_literal(FOAF.name) is None
+        #Edits through the resource are seen by the accessors.
+        res.add(FOAF.name, Literal(u"Joe"))
+        assert res.get_first_literal(FOAF.name) == u"Joe"
+        res.set(FOAF.name, Literal(u"Joseph"))
+        assert res.get_literals(FOAF.name) == [u"Joseph"]
+        res.remove(FOAF.knows)
+        assert res.get_related(FOAF.knows) == []
+        res[FOAF.knows] = D['bob']
+        assert res.get_related(FOAF.knows) ==\
+            [{'uri': D['bob'].toPython(), 'label': u"Jones, Bob"}]
+        #Direct graph edits need the index rebuilt.
+        g.add((self.uri, FOAF.nick, Literal(u"Joey")))
+        res.index()
+        assert res.get_first_literal(FOAF.nick) == u"Joey"
+
+
 class TestFaculty:
     def setup_class(self):
         test_data = u"""
@@ -73,6 +102,14 @@ class TestFaculty:
 
         d:org1 a foaf:Organization ;
             rdfs:label "History" .
+
+        d:jcarberry vivo:personInPosition d:pos1, d:pos2 .
+
+        d:pos1 a vivo:FacultyPosition ;
+            rdfs:label "Professor of History" .
+
+        d:pos2 a vivo:FacultyAdministrativePosition ;
+            rdfs:label "Chair of History" .
         """
         test_store = work_graph()
         test_store.parse(data=test_data, format='turtle')
@@ -96,3 +133,200 @@ class TestFaculty:
         related_labels = [r['label'] for r in related]
         assert u"Medicine" in related_labels
         assert u"History" in related_labels
+
+    def test_load_many(self):
+        uris = [D["jsmith"], D["jcarberry"]]
+        loaded = FacultyMember.load_many(uris, self.store, chunk_size=1)
+        assert [fac.identifier for fac in loaded] == uris
+        for fac in loaded:
+            single = FacultyMember(uri=fac.identifier, store=self.store)
+            assert isomorphic(fac.graph, single.graph)
+        smith, carberry = loaded
+        assert smith.first() == u"John"
+        assert smith.membership() == []
+        assert carberry.email() == "jcarberry@brown.edu"
+        assert {'uri': u'http://vivo.school.edu/individual/org1', 'label': u'History'}\
+            in carberry.membership()
+
+        #One query for all.
+        loaded = FacultyMember.load_many(uris, self.store)
+        assert isomorphic(loaded[1].graph, carberry.graph)
+
+    def test_iter_related(self):
+        #Against the whole store, only this resource's objects are returned.
+        res = BaseResource(uri=D["jcarberry"], graph=self.store)
+        labels = sorted(r['label'] for r in res.iter_related())
+        assert labels == [u"Chair of History", u"History", u"Medicine",
+                          u"Professor of History"]
+        topics = list(res.iter_related(predicates=[VIVO.hasResearchArea]))
+        assert topics == [{'uri': D["topic1"].toPython(), 'label': u"Medicine"}]
+        pages = [
+            list(res.iter_related(limit=2, offset=offset))
+            for offset in [0, 2, 4]
+        ]
+        assert [len(page) for page in pages] == [2, 2, 0]
+        assert sorted(r['label'] for page in pages for r in page) == labels
+
+    def test_positions(self):
+        fac = FacultyMember(uri=D["jcarberry"], store=self.store)
+        assert fac.faculty_titles() == [u"Professor of History"]
+        assert fac.administrative_titles() == [u"Chair of History"]
+        smith = FacultyMember(uri=D["jsmith"], store=self.store)
+        assert smith.faculty_titles() == []
+
+    def test_split_queries(self):
+        """
+        The split queries construct the same graph as the single query.
+        """
+        for uri in [D["jcarberry"], D["jsmith"]]:
+            fac = FacultyMember(uri=uri, store=self.store)
+            single = self.store.query(
+                fac.init_query(),
+                initBindings=dict(subject=uri)
+            ).graph
+            assert isomorphic(fac.graph, single)
+
+
+class CountingGraph(Graph):
+    """
+    In memory store that counts queries.
+    """
+    queries = 0
+
+    def query(self, *args, **kwargs):
+        self.queries += 1
+        return Graph.query(self, *args, **kwargs)
+
+
+class QuietBackend(VIVOBackend):
+
+    def __init__(self):
+        VIVOBackend.__init__(self, 'http://localhost/sparql')
+
+    def do_update(self, query):
+        pass
+
+
+class TestResourceCache:
+    def setup_method(self):
+        store = CountingGraph()
+        store.namespace_manager = work_graph().namespace_manager
+        store += [
+            (D["jsmith"], RDF.type, FOAF.Person),
+            (D["jsmith"], RDFS.label, Literal(u"Smith, Joe")),
+            (D["jsmith"], FOAF.knows, D["bob"]),
+            (D["bob"], RDFS.label, Literal(u"Jones, Bob")),
+        ]
+        self.store = store
+        self.cache = ResourceCache(max_entries=2)
+        VResource.cache = self.cache
+
+    def teardown_method(self):
+        VResource.cache = None
+
+    def test_hit(self):
+        first = Person(uri=D["jsmith"], store=self.store)
+        queries = self.store.queries
+        second = Person(uri=D["jsmith"], store=self.store)
+        assert self.store.queries == queries
+        assert isomorphic(second.graph, first.graph)
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+        #Keyed by class as well as URI.
+        VResource(uri=D["jsmith"], store=self.store)
+        assert self.store.queries > queries
+
+    def test_eviction_and_ttl(self):
+        for name in ["jsmith", "bob", "other"]:
+            VResource(uri=D[name], store=self.store)
+        assert len(self.cache) == 2
+        assert self.cache.get(VResource, D["jsmith"], self.store) is None
+        assert self.cache.get(VResource, D["other"], self.store) is not None
+        self.cache.ttl = -1
+        self.cache.set(VResource, D["jsmith"], Graph(), self.store)
+        assert self.cache.get(VResource, D["jsmith"], self.store) is None
+
+    def test_copies(self):
+        first = Person(uri=D["jsmith"], store=self.store)
+        second = Person(uri=D["jsmith"], store=self.store)
+        assert second.graph is not first.graph
+        #Edits to one resource don't reach the others or the cache.
+        second.set(RDFS.label, Literal(u"Smith, Joseph"))
+        assert first.get_label() == u"Smith, Joe"
+        assert Person(uri=D["jsmith"], store=self.store).get_label() == u"Smith, Joe"
+
+    def test_remote_keyed_by_endpoint(self):
+        url = 'http://localhost/vivo/api/sparqlQuery'
+        one = FusekiGraph(url)
+        assert self.cache.key(Person, D["jsmith"], one) ==\
+            self.cache.key(Person, D["jsmith"], FusekiGraph(url))
+        assert self.cache.key(Person, D["jsmith"], one) !=\
+            self.cache.key(Person, D["jsmith"], FusekiGraph(url + '2'))
+
+    def test_keyed_by_store(self):
+        Person(uri=D["jsmith"], store=self.store)
+        other = CountingGraph()
+        other += self.store
+        assert self.cache.get(Person, D["jsmith"], other) is None
+        person = Person(uri=D["jsmith"], store=other)
+        assert other.queries > 0
+        assert person.graph is not self.cache.get(Person, D["jsmith"], self.store)
+
+    def test_backend_invalidation(self):
+        backend = QuietBackend()
+        backend.listeners.append(self.cache.invalidate)
+        person = Person(uri=D["jsmith"], store=self.store)
+        assert self.cache.get(Person, D["jsmith"], self.store) is not None
+        #Bob's label is part of the cached graph for jsmith.
+        assert (D["bob"], RDFS.label, Literal(u"Jones, Bob")) in person.graph
+        add_g = Graph()
+        add_g.add((D["bob"], RDFS.label, Literal(u"Jones, Robert")))
+        backend.add_remove(add_g, Graph())
+        assert self.cache.get(Person, D["jsmith"], self.store) is None
+
+        Person(uri=D["jsmith"], store=self.store)
+        with backend.batch() as writer:
+            writer.add_remove(Graph(), add_g)
+        assert self.cache.get(Person, D["jsmith"], self.store) is None
+
+    def edit(self, backend, add_g):
+        self.store += add_g
+        backend.add_remove(add_g, Graph())
+
+    def test_invalidate_empty(self):
+        backend = QuietBackend()
+        backend.listeners.append(self.cache.invalidate)
+        assert FacultyMember(uri=D["new"], store=self.store).first() is None
+        add_g = Graph()
+        add_g += [
+            (D["new"], RDF.type, VIVO.FacultyMember),
+            (D["new"], RDFS.label, Literal(u"New, Nan")),
+            (D["new"], FOAF.firstName, Literal(u"Nan")),
+            (D["new"], FOAF.lastName, Literal(u"New")),
+        ]
+        self.edit(backend, add_g)
+        assert FacultyMember(uri=D["new"], store=self.store).first() == u"Nan"
+
+    def test_invalidate_linked(self):
+        backend = QuietBackend()
+        backend.listeners.append(self.cache.invalidate)
+        self.store += [
+            (D["jsmith"], RDF.type, VIVO.FacultyMember),
+            (D["jsmith"], FOAF.firstName, Literal(u"Joe")),
+            (D["jsmith"], FOAF.lastName, Literal(u"Smith")),
+            #No label, so not in the constructed graph.
+            (D["jsmith"], BLOCAL.hasAffiliation, D["org9"]),
+        ]
+        assert FacultyMember(uri=D["jsmith"], store=self.store).membership() == []
+        add_g = Graph()
+        add_g.add((D["org9"], RDFS.label, Literal(u"Org 9")))
+        self.edit(backend, add_g)
+        assert FacultyMember(uri=D["jsmith"], store=self.store).membership() ==\
+            [{'uri': D["org9"].toPython(), 'label': u"Org 9"}]
+
+    def test_load_many(self):
+        Person.load_many([D["jsmith"]], self.store)
+        queries = self.store.queries
+        Person(uri=D["jsmith"], store=self.store)
+        assert self.store.queries == queries
+        self.cache.invalidate([D["bob"]])
+        assert self.cache.get(Person, D["jsmith"], self.store) is None
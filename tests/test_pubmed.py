@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from pprint import pprint
 import os
+import json
+from urllib.parse import urlparse, parse_qs
+
+import responses
 
 from rdflib import URIRef, RDF, RDFS, OWL
 
@@ -8,7 +12,7 @@ from .tutils import load, BTest
 from dateutil import parser
 import datetime
 
-from vdm.pubmed import Publication
+from vdm.pubmed import Publication, ESUMMARY_URL
 from vdm.namespaces import ns_mgr, BCITE, D
 
 class TestArticle(BTest):
@@ -315,3 +319,45 @@ def test_doi_search():
     doi = u"10.1016/j.tet.2011.10.047"
     rsp = doi_search(doi)
     assert( rsp is None )
+
+
+@responses.activate
+def test_fetch_many():
+    """
+    Batch fetch splits results by PMID and reports missing ids
+    individually.
+    """
+    article = load('pubmed_article.json')['result']['23910982']
+    book = load('pubmed_book.json')['result']['22553887']
+    requested = []
+
+    def esummary(request):
+        query = parse_qs(urlparse(request.url).query)
+        ids = query['id'][0].split(',')
+        requested.append(ids)
+        result = {'uids': []}
+        for pmid in ids:
+            if pmid == article['uid']:
+                result[pmid] = article
+            elif pmid == book['uid']:
+                result[pmid] = book
+            else:
+                result[pmid] = {'uid': pmid, 'error': 'cannot get document summary'}
+        return (200, {}, json.dumps({'result': result}))
+
+    responses.add_callback(
+        responses.GET,
+        ESUMMARY_URL.split('?')[0],
+        callback=esummary,
+        content_type='application/json'
+    )
+    pub = Publication()
+    found, errors = pub.fetch_many(
+        ['23910982', '22553887', '1234', '23910982'],
+        batch_size=2
+    )
+    #Duplicate ids are only requested once.
+    assert requested == [['23910982', '22553887'], ['1234']]
+    assert sorted(found.keys()) == ['22553887', '23910982']
+    assert found['23910982']['uid'] == '23910982'
+    assert errors == {'1234': 'cannot get document summary'}
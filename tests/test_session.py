@@ -0,0 +1,72 @@
+import logging
+
+import pytest
+import responses
+
+from vdm import session
+
+
+def test_shared_session():
+    s1 = session.get_session()
+    s2 = session.get_session()
+    assert s1 is s2
+    adapter = s1.get_adapter('https://doi.org/')
+    assert adapter.max_retries.total == session.RETRIES
+    assert 429 in adapter.max_retries.status_forcelist
+
+
+def test_configure():
+    original = dict(session.settings)
+    old = session.get_session()
+    try:
+        session.configure(pool_size=2, retries=5)
+        new = session.get_session()
+        assert new is not old
+        adapter = new.get_adapter('http://eutils.ncbi.nlm.nih.gov/')
+        assert adapter.max_retries.total == 5
+        assert adapter._pool_maxsize == 2
+        with pytest.raises(Exception):
+            session.configure(pool=2)
+    finally:
+        session.configure(**original)
+
+
+def test_stream_session():
+    original = dict(session.settings)
+    old = session.get_stream_session()
+    assert session.get_stream_session() is old
+    assert old is not session.get_session()
+    assert old.get_adapter('http://localhost/').max_retries.total == 0
+    try:
+        session.configure(pool_size=2, retries=5)
+        new = session.get_stream_session()
+        assert new is not old
+        adapter = new.get_adapter('http://localhost/')
+        assert adapter.max_retries.total == 0
+        assert adapter._pool_maxsize == 2
+    finally:
+        session.configure(**original)
+
+
+@responses.activate
+def test_get():
+    responses.add(responses.GET, 'http://example.org/', body='ok')
+    resp = session.get('http://example.org/', headers={'User-Agent': 'vdm test'})
+    assert resp.text == 'ok'
+    assert resp.request.headers['User-Agent'] == 'vdm test'
+
+
+@responses.activate
+def test_timing(caplog):
+    responses.add(responses.GET, 'http://example.org/ok', body='ok')
+    #Off by default.
+    session.get('http://example.org/ok')
+    assert [r for r in caplog.records if r.name == 'vdm.session.timing'] == []
+    with caplog.at_level(logging.DEBUG, logger='vdm.session.timing'):
+        session.get('http://example.org/ok')
+    records = [r for r in caplog.records if r.name == 'vdm.session.timing']
+    assert len(records) == 1
+    assert records[0].method == 'GET'
+    assert records[0].url == 'http://example.org/ok'
+    assert records[0].status == 200
+    assert records[0].elapsed >= 0
@@ -0,0 +1,82 @@
+import pytest
+
+from rdflib import ConjunctiveGraph, Graph, Literal, URIRef, RDFS
+from rdflib.compare import isomorphic
+
+from vdm.backend import FusekiGraph, VIVOBackend
+from vdm.namespaces import D, VIVO
+from vdm.standin import StandinEndpoint, data_operations
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    with StandinEndpoint() as endpoint:
+        for name, value in endpoint.environ().items():
+            monkeypatch.setenv(name, value)
+        yield endpoint
+
+
+def labels(*pairs):
+    g = Graph()
+    for name, label in pairs:
+        g.add((D[name], RDFS.label, Literal(label)))
+    return g
+
+
+def test_add_remove(endpoint):
+    backend = VIVOBackend(endpoint.query_url)
+    backend.add_remove(labels(('n1', u'One'), ('n2', u'Two')), Graph())
+    backend.add_remove(labels(('n3', u'Three')), labels(('n2', u'Two')))
+    q = "SELECT ?s WHERE { ?s rdfs:label ?label }"
+    found = set(row[0] for row in backend.graph.query(q, initNs={'rdfs': RDFS}))
+    assert found == set([D['n1'], D['n3']])
+    assert endpoint.stats['updates'] == 2
+    #Edits go to VIVO's default graph.
+    context = endpoint.graph.get_context(URIRef(backend.default_graph))
+    assert len(context) == 2
+
+
+def test_stream_and_batch(endpoint):
+    backend = VIVOBackend(endpoint.query_url)
+    tricky = labels(('n1', u'Brace } ; "quoted"\nline é'), ('n2', u'{'))
+    backend.stream_add_remove(tricky, Graph())
+    with backend.batch(max_triples=1) as writer:
+        writer.add_remove(labels(('n3', u'Three')), Graph())
+        writer.add_remove(Graph(), labels(('n2', u'{')))
+    assert writer.requests == 2
+    assert writer.failures == []
+    g = FusekiGraph(endpoint.query_url).query(
+        "CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }"
+    ).graph
+    assert isomorphic(g, labels(('n1', u'Brace } ; "quoted"\nline é'), ('n3', u'Three')))
+
+
+def test_unauthorized(endpoint, monkeypatch):
+    monkeypatch.setenv('VIVO_PASSWORD', 'wrong')
+    backend = VIVOBackend(endpoint.query_url)
+    with pytest.raises(Exception):
+        backend.add_remove(labels(('n1', u'One')), Graph())
+    assert len(endpoint.graph) == 0
+
+
+def test_data_operations():
+    backend = VIVOBackend.__new__(VIVOBackend)
+    backend.default_graph = 'http://localhost/g'
+    add_g = labels(('n1', u'Brace } ; "quoted"\nline'), ('n2', u'Two'))
+    add_g.add((D['n1'], VIVO.overview, Literal(u'"""', lang='en')))
+    update = backend.build_clause(add_g) + u" ;\n" +\
+        backend.build_clause(labels(('n2', u'Two')), delete=True)
+    operations = data_operations(update)
+    assert [(op, name) for op, name, _ in operations] == \
+        [('INSERT', 'http://localhost/g'), ('DELETE', 'http://localhost/g')]
+    #Same result as running the update with rdflib.
+    fast = StandinEndpoint()
+    fast.server.server_close()
+    fast.update(update)
+    expected = ConjunctiveGraph()
+    expected.update(update)
+    assert isomorphic(fast.graph, expected)
+    assert len(fast.graph) == 2
+    #Anything else is left to rdflib.
+    assert data_operations(u"INSERT DATA { <a:b> <a:c> <a:d> }") is None
+    assert data_operations(u"DELETE WHERE { GRAPH <a:g> { ?s ?p ?o } }") is None
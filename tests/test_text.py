@@ -28,3 +28,53 @@ def test_url_slug():
 def test_clean_parens():
     assert clean_parens('Brown Univ (US)') == 'brown univ'
     assert clean_parens('Brown Univ (US)', normalized=False) == 'Brown Univ'
+
+
+def reference_normalize(text):
+    """
+    The original character by character normalize, kept to check
+    the table driven version gives identical output.
+    """
+    from unicodedata import normalize as ucnorm, category
+    text = text.lower()
+    decomposed = ucnorm('NFKD', text)
+    filtered = []
+    for char in decomposed:
+        cat = category(char)
+        if cat.startswith('C'):
+            filtered.append(' ')
+        elif cat.startswith('M'):
+            continue
+        elif cat.startswith('Z'):
+            filtered.append(' ')
+        elif cat.startswith('S'):
+            continue
+        else:
+            filtered.append(char)
+    text = ''.join(filtered)
+    while '  ' in text:
+        text = text.replace('  ', ' ')
+    text = text.replace('-', ' ')
+    text = text.strip()
+    return ucnorm('NFKC', text)
+
+
+def test_normalize_identical():
+    samples = [
+        u'',
+        u'   ',
+        u'Waldenström  Macroglobulinemia',
+        u'Smith-Jones,\tJ.\n\nD.',
+        u'a - b',
+        u'Brown Univ Providence',
+        u'Ångström Ω ﬁ ① $100 ©',
+    ]
+    #Every BMP character, alone and next to spaces and hyphens.
+    for start in range(0, 0x10000, 64):
+        chars = u''.join(chr(c) for c in range(start, start + 64)
+                         if not 0xd800 <= c <= 0xdfff)
+        samples.append(chars)
+        samples.append(u'  -'.join(chars))
+    for sample in samples:
+        assert normalize.__wrapped__(sample) == reference_normalize(sample)
+        assert normalize(sample) == reference_normalize(sample)
@@ -1,5 +1,10 @@
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import namedtuple
-from nameparser import HumanName
+from functools import lru_cache
+
+#Distinct name strings remembered by chunk_name.
+NAME_CACHE_SIZE = 65536
 
 
 #A named tuple to represent author names.
@@ -10,14 +15,20 @@ Author = namedtuple('Author',
 )
 
 
+@lru_cache(maxsize=NAME_CACHE_SIZE)
 def chunk_name(name_str):
     """
     Split names into last, first initial, middle initial using
     the Python name parser:
     https://github.com/derek73/python-nameparser
 
-    Return a named tuple representing the author.
+    Return a named tuple representing the author.  Results are cached,
+    see chunk_name.cache_info() for hit and miss counts.  Cached names
+    aren't parsed again when nameparser's CONSTANTS (titles, prefixes
+    and so on) change, so call chunk_name.cache_clear() after changing
+    them.
     """
+    from nameparser import HumanName
     name = HumanName(name_str)
     last = name.last.lower()
     first = name.first.lower().strip('.')
@@ -45,6 +56,17 @@ def chunk_name(name_str):
     return au
 
 
+def chunk_names(names):
+    """
+    Parse many name strings, parsing each distinct string once.
+
+    Returns a list of Authors in the order of names.
+    """
+    names = list(names)
+    parsed = dict((name, chunk_name(name)) for name in set(names))
+    return [parsed[name] for name in names]
+
+
 def substr_match(a, b):
     """
     Verify substring matches of two strings.
@@ -72,4 +94,158 @@ def catalyst_match(au1, au2):
                     return True
             else:
                 return True
-    return False
\ No newline at end of file
+    return False
+
+def block_key(au):
+    """
+    Authors can only catalyst_match when they share an exact last name
+    and first initial, so these make the blocking key.  Authors without
+    a first name can't be matched and get None.
+    """
+    if not au.first:
+        return None
+    return (au.last, au.first[0])
+
+
+def build_blocks(roster):
+    """
+    Group a roster of authors by block_key.
+    """
+    blocks = {}
+    for au in roster:
+        key = block_key(au)
+        if key is not None:
+            blocks.setdefault(key, []).append(au)
+    return blocks
+
+
+class AuthorRoster:
+    """
+    Compact, column oriented store for a large set of Authors.
+
+    Each distinct name part is stored once in a string table and rows
+    are integer codes held in arrays.  The full name strings, which are
+    rarely shared, are packed into one UTF-8 buffer.  Rows are sorted by
+    a block key of last name and first initial, on first lookup after
+    rows are added, to support catalyst_match style lookups.
+    """
+
+    #Coded columns.  Code 0 is None.
+    coded = ('last', 'first', 'first_initial', 'middle', 'middle_initial')
+
+    def __init__(self, authors=()):
+        self.strings = [None]
+        self.codes = {None: 0}
+        #Row n's full name is full_data[full_offsets[n]:full_offsets[n + 1]]
+        self.full_data = bytearray()
+        self.full_offsets = array('I', [0])
+        self.columns = dict((field, array('i')) for field in self.coded)
+        #Block key of each row, -1 when the row can't be matched.
+        self.block_keys = array('q')
+        #Rows in block key order and their keys, for binary search.
+        self._order = array('i')
+        self._sorted_keys = array('q')
+        self.extend(authors)
+
+    def __len__(self):
+        return len(self.full_offsets) - 1
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not (0 <= row < len(self)):
+            raise IndexError("AuthorRoster index out of range")
+        values = dict(
+            (field, self.strings[self.columns[field][row]])
+            for field in self.coded
+        )
+        start, end = self.full_offsets[row], self.full_offsets[row + 1]
+        full = self.full_data[start:end].decode('utf-8')
+        return Author(full=full, **values)
+
+    def code(self, value):
+        """
+        Get the code for a string, adding it to the table if needed.
+        """
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.codes[value] = code
+        return code
+
+    def _block(self, au):
+        key = block_key(au)
+        if key is None:
+            return None
+        last = self.codes.get(key[0])
+        initial = self.codes.get(key[1])
+        if (last is None) or (initial is None):
+            return None
+        return (last << 32) | initial
+
+    def append(self, au):
+        self.full_data += (au.full or u'').encode('utf-8')
+        self.full_offsets.append(len(self.full_data))
+        for field in self.coded:
+            self.columns[field].append(self.code(getattr(au, field)))
+        if au.first:
+            self.code(au.first[0])
+        key = self._block(au)
+        self.block_keys.append(-1 if key is None else key)
+
+    def extend(self, authors):
+        for au in authors:
+            self.append(au)
+
+    def block(self, au):
+        """
+        Rows in the same block as the given author.
+        """
+        key = self._block(au)
+        if key is None:
+            return []
+        if len(self._order) != len(self):
+            #Stable sort keeps rows in a block in the order added.
+            order = sorted(range(len(self)), key=self.block_keys.__getitem__)
+            self._order = array('i', order)
+            self._sorted_keys = array('q', (self.block_keys[row] for row in order))
+        start = bisect_left(self._sorted_keys, key)
+        end = bisect_right(self._sorted_keys, key)
+        return self._order[start:end].tolist()
+
+    def match(self, au):
+        """
+        Rows that catalyst_match the given author.
+        """
+        return [
+            row for row in self.block(au)
+            if catalyst_match(au, self[row]) is True
+        ]
+
+
+def match_many(candidates, roster):
+    """
+    Find every (candidate, roster author) pair that catalyst_match
+    accepts, only comparing authors in the same block.  The roster
+    can be a list of Authors or an AuthorRoster.
+    """
+    matches = []
+    if isinstance(roster, AuthorRoster):
+        for cand in candidates:
+            for row in roster.match(cand):
+                matches.append((cand, roster[row]))
+        return matches
+    blocks = build_blocks(roster)
+    for cand in candidates:
+        key = block_key(cand)
+        if key is None:
+            continue
+        for au in blocks.get(key, []):
+            if catalyst_match(cand, au) is True:
+                matches.append((cand, au))
+    return matches
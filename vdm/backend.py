@@ -10,18 +10,30 @@ from rdflib import (
     URIRef
 )
 from rdflib.query import ResultException
-from SPARQLWrapper import SPARQLWrapper
 
+from collections import namedtuple
+from contextlib import contextmanager
+from urllib.parse import quote_plus, urlencode
 import uuid
 
+from . import metrics, session
 from .utils import get_env
 
+from . import namespaces as vdm_ns
 from .namespaces import (
     namespaces,  #dict of namespaces
-    ns_mgr,
     D,  #data namespace
 )
 
+#Triples sent in a single batched update request.
+BATCH_SIZE = 5000
+
+#Bytes sent per chunk when streaming update requests.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+#Edits that could not be written by a BatchWriter.
+BatchFailure = namedtuple('BatchFailure', ['edits', 'error'])
+
 
 class BaseBackend:
     """
@@ -118,12 +130,25 @@ class VIVOBackend(BaseBackend):
     def __init__(self, endpoint):
         graph = ConjunctiveGraph('SPARQLStore')
         graph.open(endpoint)
-        graph.namespace_manager = ns_mgr
+        graph.namespace_manager = vdm_ns.ns_mgr
         self.graph = graph
         self.default_graph = \
             'http://vitro.mannlib.cornell.edu/default/vitro-kb-2'
+        #Called with the set of edited subjects after each update.
+        self.listeners = []
+
+    def notify(self, *graphs):
+        """
+        Tell listeners which subjects were edited.
+        """
+        subjects = set()
+        for g in graphs:
+            subjects.update(g.subjects())
+        for listener in self.listeners:
+            listener(subjects)
 
     def do_update(self, query):
+        from SPARQLWrapper import SPARQLWrapper
         logger.debug(query)
         update_url = get_env('VIVO_URL') + '/api/sparqlUpdate'
         sparql = SPARQLWrapper(update_url)
@@ -131,19 +156,104 @@ class VIVOBackend(BaseBackend):
         sparql.addParameter('password', get_env('VIVO_PASSWORD'))
         sparql.method = 'POST'
         sparql.setQuery(query)
-        results = sparql.query()
+        metrics.inc('vdm_sparql_update_bytes_total', len(query.encode('utf-8')))
+        with self.update_metrics():
+            results = sparql.query()
         return results
 
-    def build_clause(self, change_graph, name=None, delete=False):
+    @contextmanager
+    def update_metrics(self):
+        """
+        Time an update request and count whether it succeeded.
+        """
+        result = 'error'
+        try:
+            with metrics.timer('vdm_sparql_update_seconds'):
+                yield
+            result = 'ok'
+        finally:
+            metrics.inc('vdm_sparql_updates_total', result=result)
+
+    def iter_clause(self, change_graph, name=None, delete=False):
+        """
+        Generate an INSERT DATA or DELETE DATA clause piece by piece
+        so large graphs can be streamed.
+        """
         nameg = name or self.default_graph
-        stmts = ''
-        for subject, predicate, obj in change_graph:
-            triple = "%s %s %s .\n" % (subject.n3(), predicate.n3(), obj.n3())
-            stmts += triple
         if delete is False:
-            return u"INSERT DATA { GRAPH <%s> { %s } }" % (nameg, stmts)
+            yield u"INSERT DATA { GRAPH <%s> { " % nameg
         else:
-            return u"DELETE DATA { GRAPH <%s> { %s } }" % (nameg, stmts)
+            yield u"DELETE DATA { GRAPH <%s> { " % nameg
+        for subject, predicate, obj in change_graph:
+            yield u"%s %s %s .\n" % (subject.n3(), predicate.n3(), obj.n3())
+        yield u" } }"
+
+    def build_clause(self, change_graph, name=None, delete=False):
+        return u"".join(self.iter_clause(change_graph, name=name, delete=delete))
+
+    def iter_update(self, add_g, subtract_g, name=None):
+        """
+        Generate a full update request for the add and subtract graphs.
+        """
+        if len(add_g) != 0:
+            for chunk in self.iter_clause(add_g, name=name):
+                yield chunk
+        if (len(add_g) != 0) and (len(subtract_g) != 0):
+            yield u" ;\n"
+        if len(subtract_g) != 0:
+            for chunk in self.iter_clause(subtract_g, name=name, delete=True):
+                yield chunk
+
+    def iter_form_body(self, chunks, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        URL encode the update form as it is generated, yielding
+        bytes in pieces of about chunk_size.
+        """
+        head = urlencode({
+            'email': get_env('VIVO_USER'),
+            'password': get_env('VIVO_PASSWORD'),
+        })
+        buf = [head + '&update=']
+        size = len(buf[0])
+        for chunk in chunks:
+            encoded = quote_plus(chunk)
+            buf.append(encoded)
+            size += len(encoded)
+            if size >= chunk_size:
+                yield u"".join(buf).encode('ascii')
+                buf = []
+                size = 0
+        if buf != []:
+            yield u"".join(buf).encode('ascii')
+
+    def stream_update(self, chunks):
+        """
+        Post an update request to VIVO using chunked transfer encoding,
+        so the request body is never held in memory.
+        """
+        update_url = get_env('VIVO_URL') + '/api/sparqlUpdate'
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        #No retries since a generated body can't be sent again.
+        with self.update_metrics():
+            resp = session.get_stream_session().post(
+                update_url,
+                data=self.iter_form_body(chunks),
+                headers=headers,
+                timeout=session.settings['timeout']
+            )
+            resp.raise_for_status()
+        return resp
+
+    def stream_add_remove(self, add_g, subtract_g, name=None):
+        """
+        Like add_remove but streams the request for very large graphs.
+        """
+        if (len(add_g) == 0) and (len(subtract_g) == 0):
+            logger.info("Graphs empty.  No edit made.")
+            return True
+        self.stream_update(self.iter_update(add_g, subtract_g, name=name))
+        self.notify(add_g, subtract_g)
+        return True
 
     def add_remove(self, add_g, subtract_g, name=None):
         """
@@ -155,13 +265,103 @@ class VIVOBackend(BaseBackend):
         add_size = len(add_g)
         remove_size = len(subtract_g)
         if (add_size == 0) and (remove_size == 0):
-            logging.info("Graphs empty.  No edit made.")
+            logger.info("Graphs empty.  No edit made.")
         if add_size != 0:
             rq += self.build_clause(add_g, name=name)
         if remove_size != 0:
             rq += ' ' + self.build_clause(subtract_g, name=name, delete=True)
-        logger.debug("SPARQL Update Query:\n".format(rq))
+        logger.debug("SPARQL Update Query:\n%s", rq)
         self.do_update(rq)
+        self.notify(add_g, subtract_g)
+        return True
+
+    def batch(self, max_triples=BATCH_SIZE, name=None):
+        """
+        Get a BatchWriter for buffering many edits into few requests.
+        """
+        return BatchWriter(self, max_triples=max_triples, name=name)
+
+
+class BatchWriter:
+    """
+    Buffer add and subtract graphs and send them to the backend as
+    multi-operation SPARQL Update requests of about max_triples.
+
+    Pending edits are sent when the buffer fills, on flush, and when
+    leaving the with block.  Failed requests are kept in failures
+    rather than raised so the rest of the load can continue.
+
+        with backend.batch() as writer:
+            for add_g, subtract_g in edits:
+                writer.add_remove(add_g, subtract_g)
+        for failed in writer.failures:
+            ...
+    """
+
+    def __init__(self, backend, max_triples=BATCH_SIZE, name=None):
+        self.backend = backend
+        self.max_triples = max_triples
+        self.name = name
+        self.pending = []
+        self.size = 0
+        self.requests = 0
+        self.failures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+        return False
+
+    def add_remove(self, add_g, subtract_g, name=None):
+        edit_size = len(add_g) + len(subtract_g)
+        if edit_size == 0:
+            logger.info("Graphs empty.  No edit made.")
+            return
+        if (self.size > 0) and (self.size + edit_size > self.max_triples):
+            self.flush()
+        self.pending.append((add_g, subtract_g, name or self.name))
+        self.size += edit_size
+        if self.size >= self.max_triples:
+            self.flush()
+
+    def build_request(self, edits):
+        """
+        Join the edits into one update, keeping their order.
+        """
+        operations = []
+        for add_g, subtract_g, name in edits:
+            if len(add_g) != 0:
+                operations.append(self.backend.build_clause(add_g, name=name))
+            if len(subtract_g) != 0:
+                operations.append(
+                    self.backend.build_clause(subtract_g, name=name, delete=True)
+                )
+        return u" ;\n".join(operations)
+
+    def flush(self):
+        """
+        Send pending edits.  Returns False if the request failed.
+        """
+        if self.pending == []:
+            return True
+        edits, self.pending, self.size = self.pending, [], 0
+        rq = self.build_request(edits)
+        self.requests += 1
+        try:
+            self.backend.do_update(rq)
+        except Exception as e:
+            logger.error("Batch update of {0} edits failed.".format(len(edits)))
+            logger.error(e)
+            self.failures.append(BatchFailure(edits=edits, error=e))
+            return False
+        finally:
+            #A failed request may still have been partly applied.
+            graphs = []
+            for add_g, subtract_g, _ in edits:
+                graphs += [add_g, subtract_g]
+            self.backend.notify(*graphs)
         return True
 
 
@@ -172,7 +372,7 @@ class FusekiGraph(ConjunctiveGraph):
     def __init__(self, endpoint):
         ConjunctiveGraph.__init__(self, 'SPARQLStore')
         self.open(endpoint)
-        self.namespace_manager = ns_mgr
+        self.namespace_manager = vdm_ns.ns_mgr
 
 
 def work_graph():
@@ -181,7 +381,7 @@ def work_graph():
     namespace_manager set.
     """
     g = Graph()
-    g.namespace_manager = ns_mgr
+    g.namespace_manager = vdm_ns.ns_mgr
     return g
 
 
@@ -0,0 +1,268 @@
+"""
+Persistent cache for web service responses.
+
+No cache is used until one is set, e.g.:
+
+    from vdm import cache
+    cache.set_cache(cache.SQLiteCache('/var/cache/vdm.sqlite'))
+
+Entries are keyed by a namespace (the kind of lookup) and a normalized
+identifier.  Expired entries with an ETag or Last-Modified header are
+revalidated with a conditional request rather than downloaded again.
+"""
+from collections import namedtuple
+import sqlite3
+import threading
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+from . import metrics, session
+
+#Seconds an entry is fresh.
+TTL = 7 * 24 * 60 * 60
+#Entries kept before the least recently used are evicted.
+MAX_ENTRIES = 100000
+#Reads whose access times are held in memory before being written.
+ACCESS_BATCH = 1000
+
+CacheEntry = namedtuple('CacheEntry',
+    ['value', 'etag', 'last_modified', 'expires']
+)
+
+
+class BaseCache:
+    """
+    Interface for response caches.
+    """
+
+    def get(self, namespace, key):
+        """
+        Return a CacheEntry, which may have expired, or None.
+        """
+        raise NotImplementedError("Cache get not defined.")
+
+    def set(self, namespace, key, value, etag=None, last_modified=None):
+        raise NotImplementedError("Cache set not defined.")
+
+    def touch(self, namespace, key):
+        """
+        Mark an entry as fresh again after revalidation.
+        """
+        raise NotImplementedError("Cache touch not defined.")
+
+    def delete(self, namespace, key):
+        raise NotImplementedError("Cache delete not defined.")
+
+    def clear(self):
+        raise NotImplementedError("Cache clear not defined.")
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache stored in a SQLite database file.
+    """
+
+    def __init__(self, path, ttl=TTL, max_entries=MAX_ENTRIES,
+                 access_batch=ACCESS_BATCH):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.access_batch = access_batch
+        self._lock = threading.Lock()
+        #(namespace, key) -> time read, not yet written.  Reads don't
+        #write so cache hits aren't write transactions.
+        self._accessed = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            #Kept up to date by this connection so sets don't count.
+            self._count = self.conn.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+
+    def get(self, namespace, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, etag, last_modified, expires FROM responses "
+                "WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[(namespace, key)] = time.time()
+            if len(self._accessed) >= self.access_batch:
+                with self.conn:
+                    self._write_accessed()
+        return CacheEntry(*row)
+
+    def set(self, namespace, key, value, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock, self.conn:
+            updated = self.conn.execute(
+                "UPDATE responses SET value = ?, etag = ?, last_modified = ?, "
+                "expires = ?, accessed = ? WHERE namespace = ? AND key = ?",
+                (value, etag, last_modified, now + self.ttl, now, namespace, key)
+            ).rowcount
+            if updated == 0:
+                self.conn.execute(
+                    "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, key, value, etag, last_modified, now + self.ttl, now)
+                )
+                self._count += 1
+            self._accessed.pop((namespace, key), None)
+            self._evict()
+
+    def touch(self, namespace, key):
+        now = time.time()
+        with self._lock, self.conn:
+            self._accessed.pop((namespace, key), None)
+            self.conn.execute(
+                "UPDATE responses SET expires = ?, accessed = ? "
+                "WHERE namespace = ? AND key = ?",
+                (now + self.ttl, now, namespace, key)
+            )
+
+    def delete(self, namespace, key):
+        with self._lock, self.conn:
+            self._accessed.pop((namespace, key), None)
+            self._count -= self.conn.execute(
+                "DELETE FROM responses WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).rowcount
+
+    def clear(self):
+        with self._lock, self.conn:
+            self._accessed.clear()
+            self.conn.execute("DELETE FROM responses")
+            self._count = 0
+
+    def flush(self):
+        """
+        Write the access times of recent reads.
+        """
+        with self._lock, self.conn:
+            self._write_accessed()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _write_accessed(self):
+        if self._accessed:
+            self.conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE namespace = ? AND key = ?",
+                [(t, ns, k) for (ns, k), t in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _evict(self):
+        """
+        Drop the least recently used entries over max_entries.
+        """
+        extra = self._count - self.max_entries
+        if extra > 0:
+            #Eviction needs current access times.
+            self._write_accessed()
+            self._count -= self.conn.execute(
+                "DELETE FROM responses WHERE rowid IN "
+                "(SELECT rowid FROM responses ORDER BY accessed LIMIT ?)",
+                (extra,)
+            ).rowcount
+
+
+_cache = None
+
+
+def set_cache(cache):
+    """
+    Set the cache used by the clients.  Pass None to disable caching.
+    """
+    global _cache
+    _cache = cache
+
+
+def get_cache():
+    return _cache
+
+
+def fresh_value(namespace, key):
+    """
+    Return the cached value if there is a fresh entry, otherwise None.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    entry = cache.get(namespace, key)
+    if (entry is None) or (entry.expires <= time.time()):
+        metrics.inc('vdm_cache_requests_total', namespace=namespace, result='miss')
+        return None
+    metrics.inc('vdm_cache_requests_total', namespace=namespace, result='hit')
+    return entry.value
+
+
+def store_value(namespace, key, value):
+    """
+    Store a value when a cache is set.
+    """
+    cache = get_cache()
+    if cache is not None:
+        cache.set(namespace, key, value)
+
+
+def cached_get(namespace, key, url, cacheable=None, **kwargs):
+    """
+    GET the url through the cache and return the response text.
+
+    Only successful responses are stored, and when a cacheable
+    function is given only those it returns True for, so that error
+    results sent with a 200 status aren't kept.
+    """
+    cache = get_cache()
+    if cache is None:
+        return session.get(url, **kwargs).text
+    entry = cache.get(namespace, key)
+    if entry is not None:
+        if entry.expires > time.time():
+            metrics.inc('vdm_cache_requests_total', namespace=namespace, result='hit')
+            return entry.value
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry.etag is not None:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified is not None:
+            headers['If-Modified-Since'] = entry.last_modified
+        kwargs['headers'] = headers
+    resp = session.get(url, **kwargs)
+    if (resp.status_code == 304) and (entry is not None):
+        logger.debug("Revalidated %s %s.", namespace, key)
+        metrics.inc('vdm_cache_requests_total', namespace=namespace, result='revalidated')
+        cache.touch(namespace, key)
+        return entry.value
+    metrics.inc('vdm_cache_requests_total', namespace=namespace, result='miss')
+    if (resp.status_code == 200) and ((cacheable is None) or cacheable(resp.text)):
+        cache.set(
+            namespace,
+            key,
+            resp.text,
+            etag=resp.headers.get('ETag'),
+            last_modified=resp.headers.get('Last-Modified')
+        )
+    return resp.text
@@ -2,16 +2,45 @@
 Client for services from the Harvard Catalyst project.
 http://profiles.catalyst.harvard.edu/docs/ProfilesRNS_DisambiguationEngine.pdf
 """
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import os
+import threading
 import xml.etree.cElementTree as ET
 
-import requests
+from . import cache, session
 
 import logging
 logger = logging.getLogger(__name__)
 
-from .utils import get_user_agent, scrub_pmid
+from .utils import get_user_agent, iterparse_chunks, scrub_pmid
 
 SERVICE_URL = 'http://profiles.catalyst.harvard.edu/services/GetPMIDs/default.asp'
+#People disambiguated at once by the runner.
+WORKERS = 4
+#Bytes read at a time from streamed responses.
+STREAM_CHUNK_SIZE = 16 * 1024
+
+def iter_pmids(chunks):
+    """
+    Incrementally parse a service response from byte chunks, yielding
+    the text of each child of the root, a PMID, as it is read.
+    Elements are discarded once read.
+    """
+    root = None
+    depth = 0
+    for event, elem in iterparse_chunks(chunks, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield elem.text
+            root.clear()
+
 
 class DisambiguationEngine:
     """
@@ -30,34 +59,65 @@ class DisambiguationEngine:
         """
         Helper to call the service with the given args.  Will
         assemble and post the document to the web service.
+
+        When a cache is set, the returned PMIDs are cached by a
+        fingerprint of the document and the service is only called
+        again when the inputs change or the entry expires.  Only a
+        successful, fully read response is cached.
         """
         doc = self.build_doc(*args)
-        srv_response = self.post(doc)
-        pubs = self.prep_returned_list(srv_response)
+        key = self.fingerprint(doc)
+        cached = cache.fresh_value('catalyst', key)
+        if cached is not None:
+            return json.loads(cached)
+        pubs = list(self.stream(doc))
+        cache.store_value('catalyst', key, json.dumps(pubs))
         return pubs
 
+    def fingerprint(self, doc):
+        """
+        Hash of a document, which holds every input to the service
+        including the threshold and affiliation settings.
+        """
+        return hashlib.sha1(doc.encode('utf-8')).hexdigest()
+
     def post(self, xml):
         """
         Post the given doc to the service, parse the returned
         PMIDs into a list, and return list.
         """
         url = SERVICE_URL
-        headers = {'Content-Type': 'text/xml'}
-        ua = get_user_agent()
-        headers.update(ua)
-        resp = requests.post(url, data=xml, headers=headers)
-        logger.debug("Disambiguation service status code.", resp.status_code)
+        resp = session.post(url, data=xml, headers=self.headers())
+        logger.debug("Disambiguation service status code %s.", resp.status_code)
         return resp.text
 
+    def stream(self, xml):
+        """
+        Post the given doc to the service and yield the returned
+        PMIDs as the response is read.  Raises for an error status
+        before reading the body.
+        """
+        resp = session.post(SERVICE_URL, data=xml, headers=self.headers(), stream=True)
+        try:
+            logger.debug("Disambiguation service status code %s.", resp.status_code)
+            resp.raise_for_status()
+            for pmid in iter_pmids(resp.iter_content(STREAM_CHUNK_SIZE)):
+                yield pmid
+        finally:
+            resp.close()
+
+    def headers(self):
+        headers = {'Content-Type': 'text/xml'}
+        headers.update(get_user_agent())
+        return headers
+
     def prep_returned_list(self, raw):
         """
         Read the service responses into a Python list.
         """
-        root = ET.fromstring(raw)
-        publications = []
-        for child in root:
-            publications.append(child.text)
-        return publications
+        if not isinstance(raw, bytes):
+            raw = raw.encode('utf-8')
+        return list(iter_pmids([raw]))
 
     def clean_pubs(self, pubs):
         """
@@ -82,9 +142,10 @@ class DisambiguationEngine:
         See structure at above url.
         Only supports one email address at this time.
         """
-        #Validate/clean the incoming publications
-        known_pubs = self.clean_pubs(known_pubs)
-        exclude_pubs = self.clean_pubs(exclude_pubs)
+        #Validate/clean the incoming publications.  Sorted so the same
+        #inputs always give the same doc.
+        known_pubs = sorted(set(self.clean_pubs(known_pubs)))
+        exclude_pubs = sorted(set(self.clean_pubs(exclude_pubs)))
 
         root = ET.Element("FindPMIDs")
         name = ET.SubElement(root, "Name")
@@ -126,3 +187,108 @@ class DisambiguationEngine:
             padd = ET.SubElement(pmid_exclude, "PMID")
             padd.text = pub
         return ET.tostring(root).decode('utf8')
+
+
+class DisambiguationRunner:
+    """
+    Run the disambiguation engine for a roster of people in parallel.
+
+    Roster records are tuples of (first, last, middle, email, known,
+    excluded), the arguments to `DisambiguationEngine.build_doc`.
+    A failure for one person is recorded in `errors` and the run goes
+    on.  With a progress file, each finished person is written out as
+    a line of JSON and people already done are skipped when the run
+    is started again.  People that failed are tried again.
+    """
+
+    def __init__(self, engine=None, workers=WORKERS, progress_path=None):
+        self.engine = engine or DisambiguationEngine()
+        self.workers = workers
+        self.progress_path = progress_path
+        self.results = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def key(self, record):
+        """
+        Identify a person by email or, without one, by name.
+        """
+        first, last, middle, email = record[:4]
+        if email:
+            return email
+        return u" ".join(n for n in (first, middle, last) if n)
+
+    def load_progress(self):
+        """
+        Read the PMIDs found for people in earlier runs.
+        """
+        done = {}
+        if (self.progress_path is None) or (not os.path.exists(self.progress_path)):
+            return done
+        with open(self.progress_path) as inf:
+            for line in inf:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    #Partial line from a run that was killed.
+                    continue
+                if 'pmids' in entry:
+                    done[entry['key']] = entry['pmids']
+        return done
+
+    def record(self, key, pmids=None, error=None):
+        with self._lock:
+            if error is None:
+                self.results[key] = pmids
+                entry = {'key': key, 'pmids': pmids}
+            else:
+                self.errors[key] = error
+                entry = {'key': key, 'error': error}
+            if self.progress_path is not None:
+                with open(self.progress_path, 'a') as outf:
+                    outf.write(json.dumps(entry) + '\n')
+
+    def disambiguate(self, record):
+        return self.engine.do(*record)
+
+    def run(self, roster):
+        """
+        Disambiguate everyone in the roster not already done.
+
+        Returns a dict of key to PMID list, including people finished
+        in earlier runs.
+        """
+        self.results.update(self.load_progress())
+        todo = {}
+        for record in roster:
+            key = self.key(record)
+            if key not in self.results:
+                todo[key] = record
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = dict(
+                (executor.submit(self.disambiguate, record), key)
+                for key, record in todo.items()
+            )
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    pmids = future.result()
+                except Exception as e:
+                    logger.warning("Disambiguation failed for {0}.".format(key))
+                    logger.warning(e)
+                    self.record(key, error=str(e))
+                    continue
+                self.record(key, pmids=pmids)
+        return self.results
+
+
+def disambiguate_many(roster, **kwargs):
+    """
+    Helper to run the disambiguation engine for a roster.
+
+    Returns a tuple of the dict of key to PMID list and a dict of
+    people that failed.
+    """
+    runner = DisambiguationRunner(**kwargs)
+    results = runner.run(roster)
+    return (results, runner.errors)
@@ -1,18 +1,61 @@
 """
 JSON-LD contexts.
+
+`base` and `publication_context` are built from the namespaces on
+first use.
 """
-from .namespaces import ns_mgr, D
+import threading
 
-base = {
-    "@base": str(D),
-    "a": "@type",
-    "uri": "@id",
-    "label": "rdfs:label",
-}
 
-#set namespaces from the ns_mgr
-for prefix, iri in ns_mgr.namespaces():
-    base[prefix] = iri.toPython()
+class FrozenContext(dict):
+    """
+    A JSON-LD context that can't be changed, so one instance can be
+    shared by every record.  Term definitions are frozen too.  The rdflib
+    processed form is built once, on first use.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, (
+            (k, FrozenContext(v) if isinstance(v, dict) else v)
+            for k, v in dict(*args, **kwargs).items()
+        ))
+        self._processed = None
+
+    def _frozen(self, *args, **kwargs):
+        raise TypeError("JSON-LD context is frozen.  Copy it with dict() to change it.")
+
+    __setitem__ = __delitem__ = __ior__ = _frozen
+    clear = pop = popitem = setdefault = update = _frozen
+
+    def __reduce__(self):
+        return (FrozenContext, (dict(self),))
+
+    def processed(self):
+        """
+        The context loaded into an rdflib JSON-LD Context.  Shared, so
+        don't load further contexts into it.
+        """
+        if self._processed is None:
+            from rdflib.plugins.shared.jsonld.context import Context
+            processed = Context()
+            processed.load(self)
+            self._processed = processed
+        return self._processed
+
+
+def _base():
+    from .namespaces import ns_mgr, D
+    base = {
+        "@base": str(D),
+        "a": "@type",
+        "uri": "@id",
+        "label": "rdfs:label",
+    }
+    #set namespaces from the ns_mgr
+    for prefix, iri in ns_mgr.namespaces():
+        base[prefix] = iri.toPython()
+    return base
+
 
 #BCITE publications
 publication = {
@@ -52,3 +95,24 @@ delegate = {
     "netId": "blocal:netId",
 }
 
+
+def _publication_context():
+    #Merged context for prepped publications.
+    return FrozenContext(__getattr__('base'), **publication)
+
+
+_lazy = {
+    'base': _base,
+    'publication_context': _publication_context,
+}
+_lazy_lock = threading.RLock()
+
+
+def __getattr__(name):
+    build = _lazy.get(name)
+    if build is None:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    with _lazy_lock:
+        if name not in globals():
+            globals()[name] = build()
+    return globals()[name]
@@ -1,64 +1,39 @@
 import logging
-# logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
 
 from datetime import date
 import json
 import xml.etree.ElementTree as ET
 
-import requests
-
-from rdflib import Graph
-
-# from rdflib_jsonld.parser import to_rdf
-from rdflib.plugins.parsers.jsonld import to_rdf
-
-# from rdflib.jsonld.parser import to_rdf
-
-# from rdflib.
+from . import cache, session
 
 from . import context
 
-from .utils import pull, get_user_agent, scrub_doi
-
-## setup logging ----------------------------------------------------
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("charset_normalizer").setLevel(logging.WARNING)
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
-    datefmt='%d/%b/%Y %H:%M:%S' )
-logger = logging.getLogger( '__name__' )
+from .utils import pull, get_user_agent, iterparse_chunks, scrub_doi
 
 
 doi_prefix = 'http://dx.doi.org/'
+#Bytes read at a time from streamed responses.
+STREAM_CHUNK_SIZE = 16 * 1024
 
 
 def get_crossref_rdf( doi ):
-    logger.info( 'starting get_crossref_rdf()' )
-    logger.debug( f'doi, ``{doi}``')
     assert type(doi) == str
     if doi.startswith(doi_prefix):
         pass
     else:
         doi = doi_prefix + doi
-    logger.debug( f'doi is now, ``{doi}``')
+    logger.debug("Getting CrossRef RDF for %s.", doi)
     h = {'Accept': 'application/rdf+xml'}
     ua = get_user_agent()
     h.update(ua)
-    logger.debug( f'full-headers are now, ``{h}``' )
-    handle = requests.get(doi, headers=h)
-    logger.debug( f'handle, ``{handle}``' )
-    # print(handle.request.headers)
+    body = cache.cached_get('crossref-rdf', scrub_doi(doi), doi, headers=h)
+    from rdflib import Graph
     try:
-        graph = Graph().parse(data=handle.text, format='xml')
-        logger.debug( f'graph after Graph().parse..., ``{graph}``' )
-    except Exception as e:
-        logger.debug( "Bad DOI:" + doi + "\n" + repr(e) )
-        logger.exception( 'failure getting graph' )
+        graph = Graph().parse(data=body, format='xml')
+    except Exception:
+        logger.exception("Bad DOI %s.  Failure getting graph.", doi)
         return
-    logger.debug( f'final graph returned, ```{graph}```' )
     return graph
 
 def get_citeproc(doi):
@@ -72,9 +47,9 @@ def get_citeproc(doi):
     h = {'Accept': 'application/citeproc+json'}
     ua = get_user_agent()
     h.update(ua)
-    handle = requests.get(doi, headers=h)
+    body = cache.cached_get('citeproc', scrub_doi(doi), doi, headers=h)
     try:
-        return handle.json()
+        return json.loads(body)
     except Exception as e:
         logger.error("Bad DOI {0}".format(doi))
         logger.error(e)
@@ -107,7 +82,7 @@ def metadata_search(search_string):
             full_citation += '. {}'.format(prepped['date'].year)
         return [ {'doi': prepped['doi'], 'fullCitation': full_citation }]
     except Exception as e:
-        logging.error(e)
+        logger.error(e)
         raise CrossRefSearchException("Failure to parse CR results")
 
 
@@ -196,8 +171,8 @@ class Publication:
         try:
             bib['date'] = date
         except Exception as e:
-            logging.warn("Can't create date for {0}.".format(doi))
-            logging.warn(e)
+            logger.warning("Can't create date for {0}.".format(doi))
+            logger.warning(e)
 
         #venue
         venue = {}
@@ -210,10 +185,7 @@ class Publication:
         bib['venue'] = venue
         bib['published_in'] = pull(meta, 'container-title')
 
-        c = {}
-        c.update(context.base)
-        c.update(context.publication)
-        bib['@context'] = c
+        bib['@context'] = context.publication_context
         return bib
 
     def to_json(self, doi):
@@ -225,7 +197,9 @@ class Publication:
         return meta
 
     def to_graph(self, prepped):
-        g = to_rdf(prepped, Graph())
+        #rdflib is only loaded when needed.
+        from . import jsonld
+        g = jsonld.to_graph(prepped)
         return g
 
 
@@ -250,21 +224,52 @@ def by_openurl(ourl_params, email):
     }
     #Add incoming parameters
     payload.update(ourl_params)
-    logger.debug("CrossRef url ``{}`` with params ``{}``".format(cr_url, json.dumps(payload)))
-    resp = requests.get(cr_url, params=payload)
+    logger.debug("CrossRef url %s with params %s", cr_url, payload)
+    resp = session.get(cr_url, params=payload, stream=True)
     try:
-        root = ET.fromstring(resp.text.encode('utf-8', 'ignore'))
-    except UnicodeEncodeError:
+        cr_title, doi = parse_openurl(resp.iter_content(STREAM_CHUNK_SIZE))
+    except ET.ParseError:
         logger.info("Error parsing CR response")
         return
-    title_elem = root.find('./doi_record/crossref/journal/journal_article/titles/title')
-    if title_elem is None:
+    finally:
+        resp.close()
+    if cr_title is None:
         return
-    cr_title = title_elem.text
-    doi_node = root.findall('./doi_record/crossref/journal/journal_article/doi_data/doi')
-    try:
-        doi = doi_node[0].text
-    except IndexError:
+    if doi is None:
         logger.info("Error parsing DOI from CR response.")
         return
     return (cr_title, doi)
+
+
+#Paths, below the root, of the article title and DOI in unixref.
+OPENURL_ARTICLE = ('doi_record', 'crossref', 'journal', 'journal_article')
+OPENURL_TITLE = OPENURL_ARTICLE + ('titles', 'title')
+OPENURL_DOI = OPENURL_ARTICLE + ('doi_data', 'doi')
+
+
+def parse_openurl(chunks):
+    """
+    Incrementally parse a unixref OpenURL response from byte chunks.
+    Returns the first article title and DOI, either of which may be
+    None.  Reading stops once both are found and elements are removed
+    from the tree as they are finished.
+    """
+    title = None
+    doi = None
+    #Open elements, from the root.
+    stack = []
+    for event, elem in iterparse_chunks(chunks, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        found = tuple(e.tag for e in stack[1:])
+        stack.pop()
+        if (found == OPENURL_TITLE) and (title is None):
+            title = elem.text
+        elif (found == OPENURL_DOI) and (doi is None):
+            doi = elem.text
+        if (title is not None) and (doi is not None):
+            break
+        if stack != []:
+            stack[-1].remove(elem)
+    return (title, doi)
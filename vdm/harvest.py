@@ -0,0 +1,283 @@
+"""
+Concurrent harvesting of publication metadata from Pubmed and CrossRef.
+
+Lookups are run with bounded concurrency and spaced out to respect the
+rate limits of each service, retries included.  PMIDs are fetched in
+batches of `pubmed.BATCH_SIZE`.  Prepped JSON-LD dicts are yielded as
+soon as each lookup completes.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from urllib3.util.retry import Retry
+
+import logging
+logger = logging.getLogger(__name__)
+
+from . import crossref, pubmed, session
+from .utils import scrub_doi, scrub_pmid
+
+#Requests per second allowed by each service.
+#NCBI allows 3 a second without an API key and 10 with one.
+NCBI_RATE = 3
+#CrossRef polite pool.
+CROSSREF_RATE = 10
+
+#Lookups in flight at any one time.
+CONCURRENCY = 8
+
+DOI_PREFIXES = (
+    '10.', 'doi:', 'http://dx.doi.org/', 'https://dx.doi.org/',
+    'dx.doi.org/', 'http://doi.org/', 'https://doi.org/', 'doi.org/',
+)
+PMID_PREFIX = 'pmid:'
+
+
+def classify(identifier):
+    """
+    Decide if an identifier is a DOI or a PMID.
+
+    Returns a tuple of the identifier type, 'doi' or 'pmid', and the
+    cleaned value.  The type is None for unrecognized identifiers.
+    PMIDs must be all digits, optionally with a PMID: prefix, so
+    numbers in other identifiers aren't taken for PMIDs.
+    """
+    value = str(identifier).strip()
+    if value.lower().startswith(DOI_PREFIXES):
+        return ('doi', scrub_doi(value))
+    digits = value
+    if digits.lower().startswith(PMID_PREFIX):
+        digits = digits[len(PMID_PREFIX):].strip()
+    if digits.isascii() and digits.isdigit():
+        pmid = scrub_pmid(digits)
+        if pmid == digits:
+            return ('pmid', pmid)
+    return (None, value)
+
+
+class RateLimiter:
+    """
+    Space out calls so that no more than `rate` start per second.
+    Calls can wait from the event loop or block in worker threads,
+    as retries do, and share the same limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Claim the next start time.  Returns the seconds until it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+            return start - now
+
+    async def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def block(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LimitedRetry(Retry):
+    """
+    Retry that waits for the rate limiter, set on a subclass made by
+    `limited_retry`, before each retry as well as for the backoff.
+    """
+    limiter = None
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.limiter is not None:
+            self.limiter.block()
+
+
+def limited_retry(limiter):
+    #A class rather than an instance since urllib3 makes new
+    #instances of the class for each attempt.
+    return type('LimitedRetry', (LimitedRetry,), {'limiter': limiter})
+
+
+def limited_session(limiter, pool_size):
+    """
+    Session with the shared session's retry settings whose retries
+    wait for the rate limiter.
+    """
+    return session.make_session(
+        pool_size=pool_size,
+        retries=session.settings['retries'],
+        backoff=session.settings['backoff'],
+        retry_class=limited_retry(limiter),
+    )
+
+
+class Harvester:
+    """
+    Look up many DOIs and PMIDs concurrently.
+
+    Identifiers that can't be fetched or prepped are recorded in
+    `errors` rather than stopping the harvest.
+    """
+
+    def __init__(self,
+            concurrency=CONCURRENCY,
+            ncbi_rate=NCBI_RATE,
+            crossref_rate=CROSSREF_RATE,
+            batch_size=pubmed.BATCH_SIZE):
+        self.concurrency = concurrency
+        self.ncbi_rate = ncbi_rate
+        self.crossref_rate = crossref_rate
+        self.batch_size = batch_size
+        self.errors = {}
+
+    def lookup_pmids(self, pmids):
+        """
+        Fetch a batch of PMIDs with one esummary request.  Returns a
+        tuple of the list of prepped publications and a dict of PMIDs
+        that failed.
+        """
+        pub = pubmed.Publication()
+        found, errors = pub.fetch_many(pmids, batch_size=len(pmids))
+        out = []
+        for pmid, meta in found.items():
+            try:
+                out.append(pub.prep(meta))
+            except Exception as e:
+                logger.warning("Harvest failed for {0}.".format(pmid))
+                logger.warning(e)
+                errors[pmid] = str(e)
+        return (out, errors)
+
+    def lookup_doi(self, doi):
+        pub = crossref.Publication()
+        meta = pub.fetch(doi)
+        if meta is None:
+            raise Exception("No CrossRef metadata found for {0}.".format(doi))
+        return ([pub.prep(meta)], {})
+
+    def jobs(self, identifiers):
+        """
+        Classify the identifiers into lookups, tuples of type, value
+        and the identifier for logging, with PMIDs in batches.
+        """
+        pmids = []
+        out = []
+        for identifier in identifiers:
+            id_type, value = classify(identifier)
+            if id_type is None:
+                self.errors[identifier] = "Unrecognized identifier."
+            elif id_type == 'pmid':
+                pmids.append(value)
+            else:
+                out.append((id_type, value, identifier))
+        #De-dupe but keep the incoming order.
+        pmids = list(dict.fromkeys(pmids))
+        for start in range(0, len(pmids), self.batch_size):
+            batch = pmids[start:start + self.batch_size]
+            out.append(('pmid', batch, ", ".join(batch)))
+        return out
+
+    async def harvest(self, identifiers):
+        """
+        Asynchronously yield prepped publications in the order
+        the lookups complete.
+        """
+        loop = asyncio.get_running_loop()
+        limiters = {
+            'pmid': RateLimiter(self.ncbi_rate),
+            'doi': RateLimiter(self.crossref_rate),
+        }
+        #Retries in these sessions wait for the limiter too.
+        sessions = dict(
+            (id_type, limited_session(limiter, self.concurrency))
+            for id_type, limiter in limiters.items()
+        )
+        lookups = {
+            'pmid': self.lookup_pmids,
+            'doi': self.lookup_doi,
+        }
+        pending = asyncio.Queue()
+        done = asyncio.Queue()
+        for job in self.jobs(identifiers):
+            pending.put_nowait(job)
+        #Sentinel marking a finished worker.
+        finished = object()
+
+        def run(id_type, value):
+            with session.using(sessions[id_type]):
+                return lookups[id_type](value)
+
+        async def worker(executor):
+            while True:
+                try:
+                    id_type, value, label = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    await done.put(finished)
+                    return
+                await limiters[id_type].wait()
+                try:
+                    prepped, errors = await loop.run_in_executor(
+                        executor, run, id_type, value
+                    )
+                except Exception as e:
+                    logger.warning("Harvest failed for {0}.".format(label))
+                    logger.warning(e)
+                    for identifier in (value if id_type == 'pmid' else [label]):
+                        self.errors[identifier] = str(e)
+                    continue
+                self.errors.update(errors)
+                for item in prepped:
+                    await done.put(item)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                workers = [
+                    loop.create_task(worker(executor))
+                    for _ in range(self.concurrency)
+                ]
+                try:
+                    remaining = len(workers)
+                    while remaining > 0:
+                        item = await done.get()
+                        if item is finished:
+                            remaining -= 1
+                        else:
+                            yield item
+                    await asyncio.gather(*workers)
+                finally:
+                    #Stop the workers if the consumer stopped early.
+                    #Lookups already running finish before the executor
+                    #shuts down.
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            for sess in sessions.values():
+                sess.close()
+
+
+def harvest(identifiers, **kwargs):
+    """
+    Helper to run a harvest from synchronous code.
+
+    Returns a tuple of the list of prepped publications and a dict
+    of identifiers that failed.
+    """
+    harvester = Harvester(**kwargs)
+
+    async def collect():
+        return [prepped async for prepped in harvester.harvest(identifiers)]
+
+    out = asyncio.run(collect())
+    return (out, harvester.errors)
@@ -0,0 +1,228 @@
+"""
+Fast conversion of prepped publication dicts to RDF.
+
+The prepped dicts from the Pubmed and CrossRef clients all have the same
+shape and context, so rather than running the generic JSON-LD algorithm
+for each record the context is compiled once into a table of predicates
+and value types and the triples are emitted directly.  Anything outside
+of that shape, e.g. a different context or JSON-LD keywords in the data,
+is handed to rdflib's `to_rdf`, so the resulting graph is always the
+same as `to_rdf` would give.
+"""
+from functools import lru_cache
+
+from rdflib import BNode, Graph, Literal, URIRef, RDF, XSD
+from rdflib.plugins.parsers.jsonld import Parser, to_rdf, VOCAB_DELIMS
+from rdflib.plugins.shared.jsonld.context import Context, UNDEF
+
+import logging
+logger = logging.getLogger(__name__)
+
+from . import context
+
+#Resolved @id and type values cached per context.
+RESOLVE_CACHE_SIZE = 65536
+
+#How a term's values become RDF objects.
+PLAIN = 'plain'
+ID = 'id'
+VOCAB = 'vocab'
+TYPED = 'typed'
+
+#Keywords that, under any alias, the emitter leaves to to_rdf.
+UNSUPPORTED_KEYWORDS = (
+    '@value', '@list', '@set', '@reverse', '@graph', '@language',
+    '@index', '@included', '@nest', '@json', '@none',
+)
+
+
+class Unsupported(Exception):
+    """
+    Raised for data the emitter doesn't handle.
+    """
+    pass
+
+
+class CompiledContext:
+    """
+    A JSON-LD context processed once for emitting many records.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        if isinstance(data, context.FrozenContext):
+            self.context = data.processed()
+        else:
+            self.context = Context()
+            self.context.load(data)
+        self.id_keys = frozenset(self.context.get_keys('@id'))
+        self.type_keys = frozenset(self.context.get_keys('@type'))
+        #Language and vocab defaults change how every value is read.
+        self.supported = (self.context.language is None) and\
+            (self.context.vocab is None) and\
+            all(
+                list(self.context.get_keys(kw)) == [kw]
+                for kw in UNSUPPORTED_KEYWORDS
+            )
+        #Prefixes bound to graphs, as to_rdf does.
+        self.bindings = [
+            (name, URIRef(term.id)) for name, term in self.context.terms.items()
+            if term.id and term.id.endswith(VOCAB_DELIMS)
+        ]
+        #Key -> (predicate, kind, datatype) or None for keys that
+        #don't produce triples.
+        self.terms = {}
+        #Contributors, venues and types repeat across records.
+        self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self.resolve)
+        self.resolve_type = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self.resolve_type)
+
+    def term(self, key):
+        try:
+            return self.terms[key]
+        except KeyError:
+            pass
+        term = self.context.terms.get(key)
+        if key in self.type_keys:
+            compiled = (RDF.type, VOCAB, None)
+        elif key.startswith('@') or (key in self.id_keys):
+            raise Unsupported(key)
+        elif term is None:
+            pred = self.context.expand(key)
+            compiled = (URIRef(pred), PLAIN, None) if pred else None
+        elif (term.container - {UNDEF}) or term.reverse or\
+                (term.context is not UNDEF) or (term.language is not UNDEF):
+            raise Unsupported(key)
+        elif not term.id:
+            compiled = None
+        elif term.id.startswith('@'):
+            raise Unsupported(key)
+        elif not term.type:
+            compiled = (URIRef(term.id), PLAIN, None)
+        elif term.type == '@id':
+            compiled = (URIRef(term.id), ID, None)
+        elif term.type.startswith('@'):
+            raise Unsupported(key)
+        else:
+            datatype = URIRef(self.context.expand(term.type))
+            compiled = (URIRef(term.id), TYPED, datatype)
+        if (compiled is not None) and compiled[0].startswith('_:'):
+            raise Unsupported(key)
+        self.terms[key] = compiled
+        return compiled
+
+    def resolve(self, ref):
+        """
+        An @id value as an RDF term, or None if it isn't an IRI.
+        """
+        if ref.startswith('_:') and len(ref) > 2:
+            return BNode(ref[2:])
+        uri = self.context.resolve(ref)
+        if ':' not in uri:
+            return None
+        return URIRef(uri)
+
+    def resolve_type(self, ref):
+        return self.resolve(self.context.expand(ref) or self.context.resolve_iri(ref))
+
+    def bind(self, graph):
+        """
+        Bind the context's prefixes to a graph, skipping those
+        already bound.
+        """
+        store = graph.store
+        for name, iri in self.bindings:
+            if (store.namespace(name) != iri) or (store.prefix(iri) != name):
+                graph.bind(name, iri)
+
+    def emit(self, node, triples, top=False):
+        """
+        Add the triples for a node to the triples list and return
+        the node's subject.
+        """
+        if not isinstance(node, dict):
+            raise Unsupported(node)
+        id_keys = [k for k in node if k in self.id_keys]
+        if len(id_keys) > 1:
+            raise Unsupported(id_keys)
+        id_val = node[id_keys[0]] if id_keys else None
+        if isinstance(id_val, str):
+            subj = self.resolve(id_val)
+            if subj is None:
+                return None
+        else:
+            subj = BNode()
+        for key, value in node.items():
+            if key == '@context':
+                if top:
+                    continue
+                raise Unsupported(key)
+            if key in self.id_keys:
+                continue
+            term = self.term(key)
+            if term is None:
+                continue
+            pred, kind, datatype = term
+            values = value if isinstance(value, list) else (value,)
+            for value in values:
+                obj = self.to_object(value, kind, datatype, triples)
+                if obj is not None:
+                    triples.append((subj, pred, obj))
+        return subj
+
+    def to_object(self, value, kind, datatype, triples):
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return self.emit(value, triples)
+        if isinstance(value, (list, tuple)):
+            raise Unsupported(value)
+        if kind == PLAIN:
+            if isinstance(value, float):
+                return Literal(value, datatype=XSD.double)
+            return Literal(value)
+        if kind == TYPED:
+            return Literal(value, datatype=datatype)
+        #to_rdf resolves @id values twice, which only differs from
+        #resolving once for values with spaces.
+        if (not isinstance(value, str)) or (' ' in value):
+            raise Unsupported(value)
+        if kind == VOCAB:
+            return self.resolve_type(value)
+        return self.resolve(value)
+
+
+PUBLICATION = CompiledContext(context.publication_context)
+
+
+def parse(prepped, graph):
+    """
+    Run the JSON-LD to_rdf algorithm, reusing the processed form of
+    a frozen context.
+    """
+    data = prepped.get('@context') if isinstance(prepped, dict) else None
+    if not isinstance(data, context.FrozenContext):
+        return to_rdf(prepped, graph)
+    node = dict((k, v) for k, v in prepped.items() if k != '@context')
+    return Parser().parse(node, data.processed(), graph)
+
+
+def to_graph(prepped, graph=None):
+    """
+    Convert a prepped dict to RDF.  Gives the same graph as rdflib's
+    JSON-LD to_rdf.
+    """
+    if graph is None:
+        graph = Graph()
+    data = prepped.get('@context') if isinstance(prepped, dict) else None
+    compiled = PUBLICATION
+    if compiled.supported and ((data is compiled.data) or (data == compiled.data)):
+        triples = []
+        try:
+            compiled.emit(prepped, triples, top=True)
+        except Unsupported as e:
+            logger.debug("Using to_rdf for unsupported data %s.", e)
+        else:
+            compiled.bind(graph)
+            graph.addN((s, p, o, graph) for s, p, o in triples)
+            return graph
+    return parse(prepped, graph)
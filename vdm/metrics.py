@@ -0,0 +1,214 @@
+"""
+Metrics for the web service clients and the SPARQL backend.
+
+No metrics are collected until a collector is set, e.g.:
+
+    from vdm import metrics
+    collector = metrics.Collector()
+    metrics.set_collector(collector)
+    ...
+    metrics.write_prometheus('/var/lib/node_exporter/vdm.prom')
+
+Reported metrics:
+
+    vdm_http_requests_total           counter, by host, method and status
+    vdm_http_request_seconds          histogram, by host
+    vdm_http_request_bytes_total      counter, bytes sent, by host
+    vdm_http_response_bytes_total     counter, bytes received, by host
+    vdm_cache_requests_total          counter, by namespace and result
+    vdm_sparql_query_seconds          histogram, VResource.init_graph and
+                                      load_many chunks, by store
+    vdm_sparql_queries_total          counter, by store
+    vdm_sparql_update_seconds         histogram, VIVOBackend updates
+    vdm_sparql_updates_total          counter, by result
+    vdm_sparql_update_bytes_total     counter, update request bytes
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+#Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class BaseCollector:
+    """
+    Interface for metrics collectors.  Labels are passed as a dict.
+    """
+
+    def inc(self, name, value=1, labels=None):
+        """
+        Add to a counter.
+        """
+        raise NotImplementedError("Collector inc not defined.")
+
+    def observe(self, name, value, labels=None):
+        """
+        Record a value, e.g. a latency in seconds, in a histogram.
+        """
+        raise NotImplementedError("Collector observe not defined.")
+
+
+class Collector(BaseCollector):
+    """
+    Collect metrics in memory.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        #(name, labels) -> value
+        self.counters = {}
+        #(name, labels) -> [bucket counts, sum, count].  Bucket counts
+        #aren't cumulative.
+        self.histograms = {}
+
+    def key(self, name, labels):
+        return (name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items())))
+
+    def inc(self, name, value=1, labels=None):
+        key = self.key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = self.key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self.histograms[key] = hist
+            hist[0][bisect_left(self.buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def counter(self, name, **labels):
+        """
+        Current value of a counter.
+        """
+        with self._lock:
+            return self.counters.get(self.key(name, labels), 0)
+
+    def histogram_count(self, name, **labels):
+        """
+        Number of values observed in a histogram.
+        """
+        with self._lock:
+            hist = self.histograms.get(self.key(name, labels))
+            return 0 if hist is None else hist[2]
+
+    def snapshot(self):
+        """
+        Copy of the counters and histograms.
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = dict(
+                (k, [list(h[0]), h[1], h[2]]) for k, h in self.histograms.items()
+            )
+        return (counters, histograms)
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+_collector = None
+
+
+def set_collector(collector):
+    """
+    Set the collector metrics are reported to.  Pass None to stop
+    collecting.
+    """
+    global _collector
+    _collector = collector
+
+
+def get_collector():
+    return _collector
+
+
+def inc(name, value=1, **labels):
+    collector = _collector
+    if collector is not None:
+        collector.inc(name, value, labels)
+
+
+def observe(name, value, **labels):
+    collector = _collector
+    if collector is not None:
+        collector.observe(name, value, labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Observe the time spent in the with block, in seconds.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra is not None else [])
+    if items == []:
+        return u""
+    escaped = (
+        u'{0}="{1}"'.format(
+            k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        )
+        for k, v in items
+    )
+    return u"{" + u",".join(escaped) + u"}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(collector=None):
+    """
+    Metrics from a Collector, by default the current one, in the
+    Prometheus text exposition format.
+    """
+    if collector is None:
+        collector = get_collector()
+    if collector is None:
+        return u""
+    counters, histograms = collector.snapshot()
+    lines = []
+    for name in sorted(set(k[0] for k in counters)):
+        lines.append(u"# TYPE {0} counter".format(name))
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(u"{0}{1} {2}".format(name, _labels(labels), _number(value)))
+    for name in sorted(set(k[0] for k in histograms)):
+        lines.append(u"# TYPE {0} histogram".format(name))
+        for (n, labels), (counts, total, count) in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            bounds = [repr(float(b)) for b in collector.buckets] + [u"+Inf"]
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                lines.append(u"{0}_bucket{1} {2}".format(
+                    name, _labels(labels, ('le', bound)), cumulative
+                ))
+            lines.append(u"{0}_sum{1} {2}".format(name, _labels(labels), _number(total)))
+            lines.append(u"{0}_count{1} {2}".format(name, _labels(labels), count))
+    return u"\n".join(lines) + u"\n" if lines else u""
+
+
+def write_prometheus(path, collector=None):
+    """
+    Write the metrics to a file, e.g. for the node exporter's textfile
+    collector at the end of a batch job.
+    """
+    with open(path, 'w') as outf:
+        outf.write(prometheus_text(collector))
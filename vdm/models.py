@@ -1,10 +1,108 @@
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import re
+import sys
+import threading
+import time
+
 import rdflib
-from rdflib import RDFS
+from rdflib import Graph, RDFS, URIRef
 from rdflib.query import ResultException
 
+from vdm import metrics
+from vdm import namespaces as vdm_ns
 from vdm.namespaces import FOAF, VIVO, BLOCAL, TMP
 
+#URIs bound in each query by VResource.load_many.
+LOAD_CHUNK_SIZE = 100
+
+WHERE_OPEN = re.compile(r'WHERE\s*{', re.IGNORECASE)
+
+def bind_subjects(rq, uris):
+    """
+    Add a VALUES block binding ?subject to the given URIs at the
+    start of the query's WHERE clause.
+    """
+    match = WHERE_OPEN.search(rq)
+    if match is None:
+        raise Exception("Query has no WHERE clause to bind.")
+    values = u"\n VALUES ?subject { %s }\n" % u" ".join(
+        URIRef(uri).n3() for uri in uris
+    )
+    return rq[:match.end()] + values + rq[match.end():]
+
+
+def is_remote(store):
+    """
+    Check if the graph is backed by a remote SPARQL endpoint.
+    """
+    #The SPARQL store is slow to import and the graph can't be using
+    #it unless it has been.
+    sparqlstore = sys.modules.get('rdflib.plugins.stores.sparqlstore')
+    if sparqlstore is None:
+        return False
+    return isinstance(getattr(store, 'store', None), sparqlstore.SPARQLStore)
+
+
+@lru_cache(maxsize=256)
+def prepared_query(rq):
+    """
+    Parse a query once for reuse against local stores.
+    """
+    from rdflib.plugins.sparql import prepareQuery
+    return prepareQuery(rq, initNs=dict(vdm_ns.ns_mgr.namespaces()))
+
+
+def store_key(store):
+    """
+    Identify a store for caching.  Remote stores are identified by
+    endpoint, so separately opened graphs on the same endpoint share
+    entries.
+    """
+    if store is None:
+        return None
+    if is_remote(store):
+        return store.store.query_endpoint
+    return store.identifier
+
+
+def copy_graph(graph):
+    g = Graph()
+    g.namespace_manager = graph.namespace_manager
+    g += graph
+    return g
+
+
+def merge_graphs(graphs):
+    """
+    Combine constructed graphs, skipping queries that returned none.
+    """
+    graphs = [g for g in graphs if g is not None]
+    if graphs == []:
+        return None
+    merged = Graph()
+    merged.namespace_manager = graphs[0].namespace_manager
+    for g in graphs:
+        merged += g
+    return merged
+
+
+def subject_graph(graph, uri):
+    """
+    Pull the triples about uri, and about the resources it links to,
+    out of a graph constructed for many resources.
+    """
+    g = Graph()
+    g.namespace_manager = graph.namespace_manager
+    for pred, obj in graph.predicate_objects(uri):
+        g.add((uri, pred, obj))
+        if not isinstance(obj, rdflib.Literal):
+            for p2, o2 in graph.predicate_objects(obj):
+                g.add((obj, p2, o2))
+    return g
+
 
 class BaseResource(rdflib.resource.Resource):
     """
@@ -17,14 +115,59 @@ class BaseResource(rdflib.resource.Resource):
         #if type(uri) != URIRef:
         #    raise Exception("uri must be a RDFLib URIRef")
         super(BaseResource, self).__init__(graph, uri)
+        self._objects = None
+        self._labels = {}
+
+    def index(self):
+        """
+        Build a predicate -> objects lookup for the resource in one
+        pass over its triples, so the accessors don't rescan the graph.
+
+        Built on first use and dropped by add, set and remove.  Call
+        again if the graph is changed directly.
+        """
+        objects = {}
+        self._labels = {}
+        if (self.graph is not None) and (self.identifier is not None):
+            for pred, obj in self.graph.predicate_objects(self.identifier):
+                objects.setdefault(pred, []).append(obj)
+        self._objects = objects
+        return objects
+
+    def _values(self, prop):
+        objects = self._objects
+        if objects is None:
+            objects = self.index()
+        return objects.get(prop, [])
+
+    def add(self, p, o):
+        super(BaseResource, self).add(p, o)
+        self._objects = None
+
+    def set(self, p, o):
+        super(BaseResource, self).set(p, o)
+        self._objects = None
+
+    def remove(self, p, o=None):
+        super(BaseResource, self).remove(p, o)
+        self._objects = None
+
+    def _object_labels(self, obj):
+        """
+        Labels of a related object, looked up once.
+        """
+        labels = self._labels.get(obj)
+        if labels is None:
+            labels = list(self.graph.objects(subject=obj, predicate=RDFS.label))
+            self._labels[obj] = labels
+        return labels
 
     def get_literals(self, prop):
         """
         Return a list of values of the property 'prop' as
         python native literals.
         """
-        return [literal.toPython() for literal
-                in self.graph.objects(self.identifier, prop)]
+        return [literal.toPython() for literal in self._values(prop)]
 
     def get_label(self, first_only=True):
         """
@@ -44,39 +187,159 @@ class BaseResource(rdflib.resource.Resource):
         with {'uri': ..., 'label', ...} pairs.
         """
         out = []
-        for obj in self.graph.objects(subject=self.identifier, predicate=prop):
-            for label in self.graph.objects(subject=obj, predicate=RDFS.label):
-                uri = obj.toPython()
-                label = label.toPython()
-                d = {'uri': uri, 'label': label}
-                if d not in out:
-                    out.append(d)
+        seen = set()
+        for obj in self._values(prop):
+            for label in self._object_labels(obj):
+                pair = (obj.toPython(), label.toPython())
+                if pair not in seen:
+                    seen.add(pair)
+                    out.append({'uri': pair[0], 'label': pair[1]})
         return out
 
-    def get_all_related(self):
+    def iter_related(self, predicates=None, limit=None, offset=None):
         """
-        Get a list of uri label pairs for all related objects.
+        Generate uri label pairs for the labelled objects of this
+        resource, optionally only for the given predicates.  Use
+        limit and offset to page through large results.
         """
-        rq = """
-        SELECT ?o ?label
+        rq = u"""
+        SELECT DISTINCT ?o ?label
         WHERE {
             ?s ?p ?o .
             ?o rdfs:label ?label .
+            %s
         }
         """
-        out = []
-        for uri, label in self.graph.query(rq):
-            out.append({'uri': uri.toPython(), 'label': label.toPython()})
-        return out
+        values = u""
+        if predicates is not None:
+            values = u"VALUES ?p { %s }" % u" ".join(
+                URIRef(pred).n3() for pred in predicates
+            )
+        rq = rq % values
+        if (limit is not None) or (offset is not None):
+            #Paging needs a stable order.
+            rq += u"ORDER BY ?o ?label\n"
+            if limit is not None:
+                rq += u"LIMIT %d\n" % limit
+            if offset is not None:
+                rq += u"OFFSET %d\n" % offset
+        results = self.graph.query(rq, initBindings=dict(s=self.identifier))
+        for uri, label in results:
+            yield {'uri': uri.toPython(), 'label': label.toPython()}
+
+    def get_all_related(self):
+        """
+        Get a list of uri label pairs for all related objects.
+        """
+        return list(self.iter_related())
 
     def get_first_literal(self, prop):
         """
         Get the first literal for the given property.
         """
-        for literal in self.graph.objects(self.identifier, prop):
+        for literal in self._values(prop):
             return literal.toPython()
 
 
+class ResourceCache:
+    """
+    Least recently used cache of constructed resource graphs, keyed
+    by resource class, store and URI, with an optional time to live.
+
+    Each resource gets its own copy of a cached graph, so edits to
+    one don't change the others.  Attach the cache to a backend so
+    edits drop any entry that the edited subjects could change:
+
+        cache = ResourceCache()
+        VResource.cache = cache
+        backend.listeners.append(cache.invalidate)
+
+    An entry is dropped by an edit to its own URI or to any subject or
+    object in its graph.  Queries should construct links to related
+    resources even when their labels are missing so adding a label is
+    seen.  Edits to resources that aren't in the graph aren't seen, so
+    set a ttl if queries reach further.
+    """
+
+    def __init__(self, max_entries=1000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        #key -> (graph, expires, nodes)
+        self.entries = OrderedDict()
+        #node -> keys of the entries that an edit to node changes
+        self.subjects = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, cls, uri, store=None):
+        #Stores are told apart by endpoint or identifier so entries
+        #don't keep stores alive.
+        return (cls, store_key(store), URIRef(uri))
+
+    def get(self, cls, uri, store=None):
+        key = self.key(cls, uri, store)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                graph, expires, _ = entry
+                if (expires is None) or (expires > time.time()):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return copy_graph(graph)
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, cls, uri, graph, store=None):
+        """
+        Cache a copy of a graph.
+        """
+        key = self.key(cls, uri, store)
+        graph = copy_graph(graph)
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        nodes = set(graph.subjects())
+        nodes.update(o for o in graph.objects() if isinstance(o, URIRef))
+        nodes.add(key[2])
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (graph, expires, nodes)
+            for node in nodes:
+                self.subjects.setdefault(node, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+
+    def invalidate(self, subjects):
+        """
+        Drop entries the edited subjects could change.
+        """
+        with self._lock:
+            for subject in subjects:
+                for key in list(self.subjects.get(subject, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.subjects.clear()
+
+    def _remove(self, key):
+        _, _, nodes = self.entries.pop(key)
+        for node in nodes:
+            keys = self.subjects.get(node)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self.subjects[node]
+
+
 class VResource(BaseResource):
     """
     A Vitro Resource representing a selected set of triples identified
@@ -85,12 +348,71 @@ class VResource(BaseResource):
     Additional methods that are common across resources can be added here.
     """
 
+    #Threads used to run init_queries against a remote store.
+    query_workers = 4
+    #Set to a ResourceCache to reuse constructed graphs.
+    cache = None
+
     def __init__(self, uri=None, store=None):
         if store is None:
             raise Exception("store must be an RDFLib Graph")
-        graph = self.init_graph(uri, store)
+        graph = None
+        if self.cache is not None:
+            graph = self.cache.get(type(self), uri, store)
+        if graph is None:
+            graph = self.init_graph(uri, store)
+            if (self.cache is not None) and (graph is not None):
+                self.cache.set(type(self), uri, graph, store)
         super(VResource, self).__init__(uri=uri, graph=graph)
 
+    @classmethod
+    def from_graph(cls, uri, graph):
+        """
+        Create a resource from an already constructed graph
+        without querying the store.
+        """
+        resource = cls.__new__(cls)
+        BaseResource.__init__(resource, uri=uri, graph=graph)
+        return resource
+
+    @classmethod
+    def load_many(cls, uris, store, chunk_size=LOAD_CHUNK_SIZE):
+        """
+        Load many resources, running the init_queries once per chunk
+        of URIs rather than once per URI.
+
+        Returns a list of resources in the order of the uris.
+        """
+        queries = cls.__new__(cls).init_queries(remote=is_remote(store))
+        uris = [URIRef(uri) for uri in uris]
+        found = {}
+        if cls.cache is not None:
+            for uri in uris:
+                graph = cls.cache.get(cls, uri, store)
+                if graph is not None:
+                    found[uri] = graph
+        missing = [uri for uri in uris if uri not in found]
+        store_label = 'remote' if is_remote(store) else 'local'
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            graphs = []
+            metrics.inc('vdm_sparql_queries_total', len(queries), store=store_label)
+            with metrics.timer('vdm_sparql_query_seconds', store=store_label):
+                for rq in queries:
+                    result = store.query(bind_subjects(rq, chunk))
+                    try:
+                        graphs.append(result.graph)
+                    except ResultException:
+                        pass
+            graph = merge_graphs(graphs)
+            if graph is None:
+                graph = Graph()
+            for uri in chunk:
+                found[uri] = subject_graph(graph, uri)
+                if cls.cache is not None:
+                    cls.cache.set(cls, uri, found[uri], store)
+        return [cls.from_graph(uri, found[uri]) for uri in uris]
+
     def init_query(self):
         """
         A SPARQL construct query to fetch triples representing the 'Resource'.
@@ -109,20 +431,49 @@ class VResource(BaseResource):
         }
         """
 
+    def init_queries(self, remote=False):
+        """
+        The queries run to construct the resource graph.  Override to
+        split a large init_query into parts that are run separately
+        and merged.  remote is True for stores behind a SPARQL
+        endpoint, where each query is a round trip.
+        """
+        return [self.init_query()]
+
     def init_graph(self, uri, store):
         """
-        Execute the init_query and return a graph object containing
-        the constructed triple.
+        Execute the init_queries and return a graph object containing
+        the constructed triples.
         """
-        rq = self.init_query()
-        result = store.query(
-            rq,
-            initBindings=dict(subject=uri)
-        )
-        try:
-            return result.graph
-        except ResultException:
-            return None
+        remote = is_remote(store)
+        queries = self.init_queries(remote=remote)
+
+        def run(rq):
+            #Local stores can skip parsing by using a prepared query.
+            if remote is False:
+                rq = prepared_query(rq)
+            result = store.query(
+                rq,
+                initBindings=dict(subject=uri)
+            )
+            try:
+                return result.graph
+            except ResultException:
+                return None
+
+        store_label = 'remote' if remote else 'local'
+        metrics.inc('vdm_sparql_queries_total', len(queries), store=store_label)
+        with metrics.timer('vdm_sparql_query_seconds', store=store_label):
+            if len(queries) == 1:
+                return run(queries[0])
+            #Only remote stores are queried concurrently.  Local stores
+            #parse queries with pyparsing, which isn't thread safe.
+            if (self.query_workers > 1) and (remote is True):
+                with ThreadPoolExecutor(max_workers=self.query_workers) as executor:
+                    graphs = list(executor.map(run, queries))
+            else:
+                graphs = [run(rq) for rq in queries]
+            return merge_graphs(graphs)
 
     def overview(self):
         return self.get_first_literal(VIVO.overview)
@@ -158,106 +509,151 @@ class FacultyMember(VResource):
     For faculty.
     """
 
-    def init_query(self):
-        """
-        A SPARQL construct query to pull out triples for a faculty resource.
-        """
-        rq = """
-        CONSTRUCT {
+    #Pairs of CONSTRUCT templates and WHERE patterns, one per part of
+    #the profile.  Each part only matches ?subject once so the parts
+    #can be run as separate small queries.  Links to related resources
+    #are constructed even without a label, so a ResourceCache entry is
+    #dropped when the label is added.
+    sections = [
+        #required - label, first, last
+        (
+            """
             ?subject a vivo:FacultyMember ;
-                #label, first, last, email required
                 rdfs:label ?name ;
                 foaf:firstName ?first ;
-                foaf:lastName ?last ;
-                vivo:preferredTitle ?title ;
-                tmp:email ?email ;
-                vivo:overview ?overview ;
-                blocal:hasAffiliation ?org ;
-                vivo:educationalTraining ?edu ;
-                vivo:hasResearchArea ?ra ;
-                tmp:image ?photo ;
-                tmp:fullImage ?miURL ;
-                blocal:hasGeographicResearchArea ?rag ;
-                tmp:facultyTitle ?facultyTitle ;
-                tmp:administrativeTitle ?adminTitle .
-            #affils
-            ?org rdfs:label ?orgName .
-            #education
-            ?edu rdfs:label ?degree .
-            #research areas
-            ?ra rdfs:label ?raName .
-            #geo research area
-            ?rag rdfs:label ?ragName .
-        }
-        WHERE {
-            #required - label, first, last
-            {
+                foaf:lastName ?last .
+            """,
+            """
             ?subject a vivo:FacultyMember ;
                 rdfs:label ?name ;
                 foaf:firstName ?first ;
                 foaf:lastName ?last .
-            }
-            #optional - title
-            UNION {
-                ?subject vivo:preferredTitle ?title .
-            }
-            #optional - email
-            UNION {
-                ?subject vivo:primaryEmail ?email .
-            }
-            #optional - overview
-            UNION {
-                ?subject vivo:overview ?overview .
-            }
-            #optional - affiliations
-            UNION {
-                ?subject blocal:hasAffiliation ?org .
-                ?org rdfs:label ?orgName .
-            }
-            #optional - education
-            UNION {
-                ?subject vivo:educationalTraining ?edu .
+            """
+        ),
+        #optional - title
+        (
+            "?subject vivo:preferredTitle ?title .",
+            "?subject vivo:preferredTitle ?title ."
+        ),
+        #optional - email
+        (
+            "?subject tmp:email ?email .",
+            "?subject vivo:primaryEmail ?email ."
+        ),
+        #optional - overview
+        (
+            "?subject vivo:overview ?overview .",
+            "?subject vivo:overview ?overview ."
+        ),
+        #optional - affiliations
+        (
+            """
+            ?subject blocal:hasAffiliation ?org .
+            ?org rdfs:label ?orgName .
+            """,
+            """
+            ?subject blocal:hasAffiliation ?org .
+            OPTIONAL { ?org rdfs:label ?orgName . }
+            """
+        ),
+        #optional - education
+        (
+            """
+            ?subject vivo:educationalTraining ?edu .
+            ?edu rdfs:label ?degree .
+            """,
+            """
+            ?subject vivo:educationalTraining ?edu .
+            OPTIONAL {
                 ?edu a vivo:EducationalTraining ;
                     rdfs:label ?degree .
             }
-            #optional - research areas
-            UNION {
-                ?subject vivo:hasResearchArea ?ra .
+            """
+        ),
+        #optional - research areas
+        (
+            """
+            ?subject vivo:hasResearchArea ?ra .
+            ?ra rdfs:label ?raName .
+            """,
+            """
+            ?subject vivo:hasResearchArea ?ra .
+            OPTIONAL {
                 ?ra a blocal:ResearchArea ;
                     rdfs:label ?raName .
             }
-            #optional - research places
-            UNION {
-                ?subject blocal:hasGeographicResearchArea ?rag .
+            """
+        ),
+        #optional - research places
+        (
+            """
+            ?subject blocal:hasGeographicResearchArea ?rag .
+            ?rag rdfs:label ?ragName .
+            """,
+            """
+            ?subject blocal:hasGeographicResearchArea ?rag .
+            OPTIONAL {
                 ?rag a blocal:Place ;
                     rdfs:label ?ragName .
             }
-            #optional - photos
-            UNION {
-                ?subject vitropublic:mainImage ?mi .
-                #main image
-                ?mi vitropublic:downloadLocation ?miDl .
-                ?miDl vitropublic:directDownloadUrl ?miURL .
-                #thumbnail
-                ?mi vitropublic:thumbnailImage ?ti .
-                ?ti vitropublic:downloadLocation ?dl .
-                ?dl vitropublic:directDownloadUrl ?photo .
-            }
-            #optional - faculty titles
-            UNION {
-                ?subject vivo:personInPosition ?pos .
-                ?pos a vivo:FacultyPosition;
-                    rdfs:label ?facultyTitle.
-            }
-            #optional - administrative titles
-            UNION {
-                ?subject vivo:personInPosition ?pos .
-                ?pos a vivo:FacultyAdministrativePosition;
-                    rdfs:label ?adminTitle.
+            """
+        ),
+        #optional - photos
+        (
+            """
+            ?subject tmp:image ?photo ;
+                tmp:fullImage ?miURL .
+            """,
+            """
+            ?subject vitropublic:mainImage ?mi .
+            #main image
+            ?mi vitropublic:downloadLocation ?miDl .
+            ?miDl vitropublic:directDownloadUrl ?miURL .
+            #thumbnail
+            ?mi vitropublic:thumbnailImage ?ti .
+            ?ti vitropublic:downloadLocation ?dl .
+            ?dl vitropublic:directDownloadUrl ?photo .
+            """
+        ),
+        #optional - faculty and administrative titles
+        #One scan of positions, with the title property picked by type.
+        (
+            "?subject ?positionProp ?positionTitle .",
+            """
+            ?subject vivo:personInPosition ?pos .
+            ?pos a ?positionType ;
+                rdfs:label ?positionTitle .
+            VALUES (?positionType ?positionProp) {
+                (vivo:FacultyPosition tmp:facultyTitle)
+                (vivo:FacultyAdministrativePosition tmp:administrativeTitle)
             }
-        }
+            """
+        ),
+    ]
+
+    def init_query(self):
+        """
+        A SPARQL construct query to pull out triples for a faculty resource.
+        """
+        template = u"\n".join(t for t, _ in self.sections)
+        where = u"\n            UNION\n".join(
+            u"{ %s }" % w for _, w in self.sections
+        )
+        return u"CONSTRUCT {\n%s\n}\nWHERE {\n%s\n}" % (template, where)
+
+    def init_queries(self, remote=False):
+        """
+        One small construct query per section, run separately and merged,
+        for local stores, where small prepared queries evaluate faster.
+        Remote stores get the combined init_query so each faculty
+        member is one round trip.
         """
-        return rq
+        if remote is True:
+            return [self.init_query()]
+        return [
+            u"CONSTRUCT {\n%s\n}\nWHERE {\n%s\n}" % (template, where)
+            for template, where in self.sections
+        ]
 
     def first(self):
         return self.get_first_literal(FOAF.firstName)
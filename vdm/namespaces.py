@@ -2,6 +2,8 @@ from .utils import get_env
 
 
 #Namespaces
+import threading
+
 from rdflib import Graph, Namespace
 from rdflib.namespace import NamespaceManager, ClosedNamespace
 from rdflib import RDFS, OWL, RDF
@@ -38,14 +40,40 @@ for k, o in vars_copy.items():
     if isinstance(o, (Namespace, ClosedNamespace)):
         namespaces[k] = o
 
-ns_mgr = NamespaceManager(Graph())
-for k, v in namespaces.items():
-    ns_mgr.bind(k.lower(), v)
 
-rq_prefixes = u"\n".join("prefix %s: <%s>" % (k.lower(), v)
-                         for k, v in namespaces.items())
+#ns_mgr, rq_prefixes and prefixes are built on first use.
+def _ns_mgr():
+    mgr = NamespaceManager(Graph())
+    for k, v in namespaces.items():
+        mgr.bind(k.lower(), v)
+    return mgr
+
+
+def _rq_prefixes():
+    return u"\n".join("prefix %s: <%s>" % (k.lower(), v)
+                      for k, v in namespaces.items())
+
 
-prefixes = u"\n    ".join("%s: %s" % (k.lower(), v)
+def _prefixes():
+    return u"\n    ".join("%s: %s" % (k.lower(), v)
                           for k, v in namespaces.items()
                           if k not in u'RDF RDFS OWL XSD')
+
+
+_lazy = {
+    'ns_mgr': _ns_mgr,
+    'rq_prefixes': _rq_prefixes,
+    'prefixes': _prefixes,
+}
+_lazy_lock = threading.Lock()
+
+
+def __getattr__(name):
+    build = _lazy.get(name)
+    if build is None:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    with _lazy_lock:
+        if name not in globals():
+            globals()[name] = build()
+    return globals()[name]
 #namespace setup complete
@@ -1,24 +1,57 @@
 import logging
 logger = logging.getLogger(__name__)
 
+from collections import OrderedDict
+import json
+
 from dateutil.parser import parse
 
-from rdflib import Graph
+from . import cache, context, session
+from .utils import pull, get_user_agent, scrub_doi
+
+ESUMMARY_URL = 'http://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi?db=pubmed&id=%s&retmode=json'
 
-# from rdflib_jsonld.parser import to_rdf
-from rdflib.plugins.parsers.jsonld import to_rdf
+#Number of PMIDs sent in a single esummary request.
+BATCH_SIZE = 200
 
 
-import requests
+def summary_ok(text):
+    """
+    Check an esummary response has no errors, for the whole request
+    or any PMID, e.g. "cannot get document summary", before caching.
+    """
+    try:
+        raw = json.loads(text)
+    except ValueError:
+        return False
+    if raw.get('error') is not None:
+        return False
+    result = raw.get('result')
+    if not isinstance(result, dict):
+        return False
+    for uid in result.get('uids', []):
+        meta = result.get(uid)
+        if (meta is None) or (meta.get('error') is not None):
+            return False
+    return True
 
-from . import context
-from .utils import pull, get_user_agent
+
+def search_ok(text):
+    """
+    Check an esearch response has no errors before caching.
+    """
+    try:
+        raw = json.loads(text)
+    except ValueError:
+        return False
+    results = raw.get('esearchresult')
+    return (results is not None) and (results.get('ERROR') is None)
 
 
 def get_pubmed(pmid):
     ua = get_user_agent()
-    doc_url = 'http://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi?db=pubmed&id=%s&retmode=json' % pmid
-    resp = requests.get(doc_url, headers=ua)
+    doc_url = ESUMMARY_URL % pmid
+    resp = session.get(doc_url, headers=ua)
     raw = resp.json()
     if raw is not None:
         meta = raw['result'][pmid]
@@ -31,16 +64,70 @@ class Publication(object):
         pass
 
     def fetch(self, pmid):
-        doc_url = 'http://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi?db=pubmed&id=%s&retmode=json' % pmid
+        doc_url = ESUMMARY_URL % pmid
         ua = get_user_agent()
-        resp = requests.get(doc_url, headers=ua)
-        raw = resp.json()
+        raw = json.loads(cache.cached_get(
+            'esummary', str(pmid), doc_url, cacheable=summary_ok, headers=ua
+        ))
         if raw.get('error') is None:
             meta = raw['result'][pmid]
             return meta
         else:
             raise Exception("No PMID found with this ID {0}.".format(doc_url))
 
+    def fetch_many(self, pmids, batch_size=BATCH_SIZE):
+        """
+        Fetch metadata for many PMIDs, sending one esummary request
+        per batch of ids.
+
+        Returns a tuple of two dicts.  The first maps PMIDs to their
+        metadata, the second maps PMIDs that could not be fetched to
+        an error message.
+        """
+        found = {}
+        errors = {}
+        #De-dupe but keep the incoming order.
+        pmids = list(OrderedDict.fromkeys(str(p) for p in pmids))
+        #Use cached summaries where we have them.
+        for pmid in pmids:
+            cached = cache.fresh_value('esummary', pmid)
+            if cached is not None:
+                found[pmid] = json.loads(cached)['result'][pmid]
+        pmids = [pmid for pmid in pmids if pmid not in found]
+        for start in range(0, len(pmids), batch_size):
+            batch = pmids[start:start + batch_size]
+            doc_url = ESUMMARY_URL % ",".join(batch)
+            ua = get_user_agent()
+            try:
+                resp = session.get(doc_url, headers=ua)
+                raw = resp.json()
+            except Exception as e:
+                logger.warning("Pubmed batch request failed {0}.".format(doc_url))
+                logger.warning(e)
+                for pmid in batch:
+                    errors[pmid] = str(e)
+                continue
+            if raw.get('error') is not None:
+                for pmid in batch:
+                    errors[pmid] = raw['error']
+                continue
+            result = raw.get('result', {})
+            for pmid in batch:
+                meta = result.get(pmid)
+                if meta is None:
+                    errors[pmid] = "No PMID found with this ID."
+                elif meta.get('error') is not None:
+                    errors[pmid] = meta['error']
+                else:
+                    found[pmid] = meta
+                    #Cache in the same shape as a single PMID response.
+                    cache.store_value(
+                        'esummary',
+                        pmid,
+                        json.dumps({'result': {'uids': [pmid], pmid: meta}})
+                    )
+        return found, errors
+
     def pub_types(self, meta):
         d = {}
         for ptype in meta.get('pubtype', []):
@@ -132,10 +219,7 @@ class Publication(object):
         if url is not None:
             bib['url'] = url
         
-        c = {}
-        c.update(context.base)
-        c.update(context.publication)
-        bib['@context'] = c
+        bib['@context'] = context.publication_context
         return bib
 
     def to_json(self, pmid):
@@ -147,7 +231,9 @@ class Publication(object):
         return meta
 
     def to_graph(self, prepped):
-        g = to_rdf(prepped, Graph())
+        #rdflib is only loaded when needed.
+        from . import jsonld
+        g = jsonld.to_graph(prepped)
         return g
 
 
@@ -166,7 +252,7 @@ def id_convert(values, idtype=None):
         params['idtype'] = idtype
 
     #Make request with user agent.
-    resp = requests.get(base, params=params, headers=ua)
+    resp = session.get(base, params=params, headers=ua)
     raw = resp.json()
     records = raw.get('records')
     if records is None:
@@ -190,8 +276,9 @@ def doi_search(doi):
     surl = base.format(doi)
     ua = get_user_agent()
     #Make request with user agent.
-    resp = requests.get(surl, headers=ua)
-    raw = resp.json()
+    raw = json.loads(cache.cached_get(
+        'esearch-doi', scrub_doi(doi), surl, cacheable=search_ok, headers=ua
+    ))
     results = raw.get('esearchresult')
     if results is not None:
         id_list = results.get('idlist')
@@ -0,0 +1,205 @@
+"""
+Shared HTTP session for the web service clients.
+
+Connections are pooled and kept alive between requests and transient
+failures (dropped connections, 429 and 5xx responses) are retried
+with exponential backoff.  Use `configure` to change the defaults and
+`using` to send a thread's requests through another session.
+
+Each request can be logged as a timing record, with method, url,
+status and elapsed (seconds) attributes, by enabling debug on the
+timing logger:
+
+    logging.getLogger('vdm.session.timing').setLevel(logging.DEBUG)
+"""
+from contextlib import contextmanager
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import metrics
+
+import logging
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger(__name__ + '.timing')
+
+#Connections kept open per host.
+POOL_SIZE = 10
+#Retries for failed requests and the backoff factor in seconds.
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+#Seconds to wait to connect and to read a response.
+TIMEOUT = (10, 60)
+
+settings = {
+    'pool_size': POOL_SIZE,
+    'retries': RETRIES,
+    'backoff': BACKOFF,
+    'timeout': TIMEOUT,
+}
+
+_session = None
+#Session without retries for request bodies that can't be sent again.
+_stream_session = None
+_lock = threading.Lock()
+#Session set by `using` for the current thread.
+_local = threading.local()
+
+
+def make_session(pool_size=POOL_SIZE, retries=RETRIES, backoff=BACKOFF,
+                 retry_class=None):
+    """
+    Create a requests session with pooling and retries.  retry_class
+    is a subclass of urllib3's Retry to use instead of Retry.
+    """
+    #Imported here to keep importing the clients quick.
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retry = (retry_class or Retry)(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        #The services posted to only read data so retrying is safe.
+        allowed_methods=None,
+        #Hand back the last response rather than raising.
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Get the shared session, creating it on first use.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = make_session(
+                pool_size=settings['pool_size'],
+                retries=settings['retries'],
+                backoff=settings['backoff'],
+            )
+        return _session
+
+
+def get_stream_session():
+    """
+    Get the shared session for streamed, generated request bodies.
+    Connections are pooled like the shared session's but failed
+    requests aren't retried since the body can't be sent again.
+    """
+    global _stream_session
+    with _lock:
+        if _stream_session is None:
+            _stream_session = make_session(
+                pool_size=settings['pool_size'],
+                retries=0,
+                backoff=settings['backoff'],
+            )
+        return _stream_session
+
+
+def configure(**kwargs):
+    """
+    Change session settings.  Accepts pool_size, retries, backoff
+    and timeout.  The shared sessions are rebuilt on next use.
+    """
+    global _session, _stream_session
+    for k in kwargs:
+        if k not in settings:
+            raise Exception("Unknown session setting {0}.".format(k))
+    with _lock:
+        settings.update(kwargs)
+        old = [_session, _stream_session]
+        _session = _stream_session = None
+    for sess in old:
+        if sess is not None:
+            sess.close()
+
+
+@contextmanager
+def using(sess):
+    """
+    Send requests made in this thread through the given session
+    rather than the shared one.
+    """
+    previous = getattr(_local, 'session', None)
+    _local.session = sess
+    try:
+        yield sess
+    finally:
+        _local.session = previous
+
+
+def current_session():
+    """
+    The session set for this thread by `using`, else the shared one.
+    """
+    sess = getattr(_local, 'session', None)
+    return get_session() if sess is None else sess
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', settings['timeout'])
+    timing = timing_logger.isEnabledFor(logging.DEBUG)
+    collector = metrics.get_collector()
+    if (timing is False) and (collector is None):
+        return current_session().request(method, url, **kwargs)
+    resp = None
+    start = time.perf_counter()
+    try:
+        resp = current_session().request(method, url, **kwargs)
+        return resp
+    finally:
+        elapsed = time.perf_counter() - start
+        status = None if resp is None else resp.status_code
+        if timing is True:
+            timing_logger.debug(
+                "%s %s %s %.3fs", method, url, status, elapsed,
+                extra={'method': method, 'url': url, 'status': status, 'elapsed': elapsed}
+            )
+        if collector is not None:
+            record(collector, method, url, resp, elapsed, kwargs.get('stream', False))
+
+
+def record(collector, method, url, resp, elapsed, stream):
+    """
+    Report a request to the metrics collector.
+    """
+    host = {'host': urlsplit(url).netloc}
+    status = 'error' if resp is None else resp.status_code
+    collector.inc('vdm_http_requests_total', 1, dict(host, method=method, status=status))
+    collector.observe('vdm_http_request_seconds', elapsed, host)
+    if resp is None:
+        return
+    body = resp.request.body
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if isinstance(body, bytes):
+        collector.inc('vdm_http_request_bytes_total', len(body), host)
+    #Streamed bodies aren't read here, so rely on the header.
+    if stream is True:
+        size = resp.headers.get('Content-Length')
+        size = int(size) if (size is not None) and size.isdigit() else None
+    else:
+        size = len(resp.content)
+    if size is not None:
+        collector.inc('vdm_http_response_bytes_total', size, host)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
@@ -0,0 +1,307 @@
+"""
+A local stand-in for a VIVO SPARQL endpoint, for load testing and
+tuning the backend without a live VIVO or Fuseki.
+
+An in memory rdflib store is served over HTTP with the VIVO update API
+(`/api/sparqlUpdate`, form posted with email, password and update) and
+a query endpoint (`/api/sparqlQuery`) that answers rdflib's SPARQLStore.
+Artificial latency can be added to each request to mimic a remote
+triple store.  Updates made only of INSERT DATA and DELETE DATA
+blocks, as the backend sends, are read with the Turtle parser since
+rdflib's SPARQL Update parser is slow and fails on large batches.
+
+    from vdm.standin import StandinEndpoint
+    with StandinEndpoint(latency=0.05) as endpoint:
+        os.environ.update(endpoint.environ())
+        backend = VIVOBackend(endpoint.query_url)
+        ...
+
+Or run it on a port for other processes:
+
+    DATA_NAMESPACE='http://vivo.school.edu/individual/' python -m vdm.standin --port 8080 --latency 0.05
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from rdflib import ConjunctiveGraph, Graph, URIRef
+
+import logging
+logger = logging.getLogger(__name__)
+
+UPDATE_PATH = '/api/sparqlUpdate'
+QUERY_PATH = '/api/sparqlQuery'
+USER = 'vivo_root@school.edu'
+PASSWORD = 'standin'
+
+#Content types for query results, as rdflib's SPARQLStore reads them.
+GRAPH_RESULTS = 'application/rdf+xml'
+SELECT_RESULTS = 'application/sparql-results+xml'
+
+DATA_OPERATION = re.compile(r'\s*(INSERT|DELETE)\s+DATA\s*\{\s*GRAPH\s*<([^>]*)>\s*\{', re.I)
+#VIVO accepts operations without the ; between them, which add_remove
+#relies on.
+DATA_END = re.compile(r'\s*\}\s*;?\s*')
+#Literals, IRIs and braces in a data block, so braces in literals
+#aren't read as the end of the block.
+DATA_TOKEN = re.compile(r'"""(?:[^"\\]|\\.|"(?!""))*"""|"(?:[^"\\]|\\.)*"|<[^>]*>|[{}]|[^{}"<]+')
+
+
+def data_operations(update):
+    """
+    Split an update of only INSERT DATA and DELETE DATA blocks, each
+    with one GRAPH, into a list of (operation, graph, triples) tuples.
+    Returns None for any other update.
+    """
+    operations = []
+    pos = 0
+    while True:
+        op = DATA_OPERATION.match(update, pos)
+        if op is None:
+            return None
+        start = pos = op.end()
+        while True:
+            token = DATA_TOKEN.match(update, pos)
+            if (token is None) or (token.group() == '{'):
+                return None
+            pos = token.end()
+            if token.group() == '}':
+                break
+        end = DATA_END.match(update, pos)
+        if end is None:
+            return None
+        operations.append((op.group(1).upper(), op.group(2), update[start:pos - 1]))
+        pos = end.end()
+        if pos == len(update):
+            return operations
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    #Keep connections alive for the pooled session.
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != QUERY_PATH:
+            return self.reply(404, b"Not found.")
+        self.server.endpoint.delay()
+        query = parse_qs(url.query).get('query')
+        if query is None:
+            return self.reply(400, b"No query.")
+        return self.query(query[0])
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self.read_body()
+        if url.path == UPDATE_PATH:
+            self.server.endpoint.delay(update=True)
+            return self.update(parse_qs(body.decode('utf-8')))
+        if url.path == QUERY_PATH:
+            self.server.endpoint.delay()
+            content_type = self.headers.get('Content-Type', '').split(';')[0]
+            if content_type == 'application/sparql-query':
+                return self.query(body.decode('utf-8'))
+            query = parse_qs(body.decode('utf-8')).get('query')
+            if query is None:
+                return self.reply(400, b"No query.")
+            return self.query(query[0])
+        return self.reply(404, b"Not found.")
+
+    def read_body(self):
+        """
+        Read the request body, which streamed updates send with
+        chunked transfer encoding.
+        """
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+            if size == 0:
+                #Skip any trailers.
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return b"".join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def query(self, query):
+        endpoint = self.server.endpoint
+        try:
+            with endpoint.lock:
+                result = endpoint.graph.query(query)
+                if result.type in ('CONSTRUCT', 'DESCRIBE'):
+                    body = result.graph.serialize(format='xml', encoding='utf-8')
+                    content_type = GRAPH_RESULTS
+                else:
+                    body = result.serialize(format='xml', encoding='utf-8')
+                    content_type = SELECT_RESULTS
+        except Exception as e:
+            logger.debug("Stand-in query failed %s.", e)
+            return self.reply(400, str(e).encode('utf-8'))
+        endpoint.count('queries')
+        return self.reply(200, body, content_type)
+
+    def update(self, form):
+        endpoint = self.server.endpoint
+        if (form.get('email') != [endpoint.user]) or\
+                (form.get('password') != [endpoint.password]):
+            return self.reply(403, b"Not authorized.")
+        update = form.get('update')
+        if update is None:
+            return self.reply(400, b"No update.")
+        try:
+            endpoint.update(update[0])
+        except Exception as e:
+            logger.debug("Stand-in update failed %s.", e)
+            return self.reply(400, str(e).encode('utf-8'))
+        endpoint.count('updates')
+        return self.reply(200, b"")
+
+    def reply(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class StandinEndpoint:
+    """
+    Serve an in memory graph as a VIVO SPARQL endpoint from a
+    background thread.
+
+    latency is the seconds added to each query and update_latency,
+    which defaults to latency, to each update.  Requests are handled
+    in parallel but the store is locked while a query or update runs,
+    like a single writer triple store.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0,
+                 update_latency=None, user=USER, password=PASSWORD, graph=None):
+        self.latency = latency
+        self.update_latency = latency if update_latency is None else update_latency
+        self.user = user
+        self.password = password
+        self.graph = ConjunctiveGraph() if graph is None else graph
+        self.lock = threading.Lock()
+        self.stats = {'queries': 0, 'updates': 0}
+        self.server = ThreadingHTTPServer((host, port), StandinHandler)
+        self.server.daemon_threads = True
+        self.server.endpoint = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    @property
+    def query_url(self):
+        return self.url + QUERY_PATH
+
+    @property
+    def update_url(self):
+        return self.url + UPDATE_PATH
+
+    def environ(self):
+        """
+        Environment variables the backend reads to post updates here.
+        """
+        return {
+            'VIVO_URL': self.url,
+            'VIVO_USER': self.user,
+            'VIVO_PASSWORD': self.password,
+        }
+
+    def delay(self, update=False):
+        seconds = self.update_latency if update is True else self.latency
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def update(self, update):
+        operations = data_operations(update)
+        if operations is not None:
+            try:
+                #Parsed before taking the lock.
+                operations = [
+                    (op, URIRef(name), Graph().parse(data=triples, format='turtle'))
+                    for op, name, triples in operations
+                ]
+            except Exception as e:
+                logger.debug("Parsing update data failed %s.", e)
+                operations = None
+        with self.lock:
+            if operations is None:
+                self.graph.update(update)
+                return
+            for op, name, data in operations:
+                context = self.graph.get_context(name)
+                if op == 'INSERT':
+                    context.addN((s, p, o, context) for s, p, o in data)
+                else:
+                    for triple in data:
+                        context.remove(triple)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a stand-in VIVO SPARQL endpoint.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to each query')
+    parser.add_argument('--update-latency', type=float,
+                        help='seconds added to each update, default --latency')
+    parser.add_argument('--data', help='RDF file to load, format guessed from the name')
+    args = parser.parse_args()
+    endpoint = StandinEndpoint(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        update_latency=args.update_latency,
+    )
+    if args.data is not None:
+        from rdflib.util import guess_format
+        endpoint.graph.parse(args.data, format=guess_format(args.data))
+    for name, value in sorted(endpoint.environ().items()):
+        print(u"{0}={1}".format(name, value))
+    print(u"Query endpoint {0}".format(endpoint.query_url))
+    try:
+        endpoint.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        endpoint.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,36 +5,54 @@ Adapted from the Helmut project.
 https://github.com/okfn/helmut/blob/master/helmut/text.py
 """
 
+from functools import lru_cache
 import re
 from unicodedata import normalize as ucnorm, category
 
-def normalize(text):
-    """ Simplify a piece of text to generate a more canonical
-    representation. This involves lowercasing, stripping trailing
-    spaces, removing symbols, diacritical marks (umlauts) and
-    converting all newlines etc. to single spaces.
+#Distinct strings remembered by normalize.
+NORMALIZE_CACHE_SIZE = 65536
+
+
+class CategoryTable(dict):
     """
-    text = text.lower()
-    decomposed = ucnorm('NFKD', text)
-    filtered = []
-    for char in decomposed:
-        cat = category(char)
+    A str.translate table that filters characters by Unicode category.
+    Entries are filled in the first time a character is seen.
+    """
+
+    def __missing__(self, code):
+        cat = category(chr(code))
         if cat.startswith('C'):
-            filtered.append(' ')
+            value = u' '
         elif cat.startswith('M'):
             # marks, such as umlauts
-            continue
+            value = None
         elif cat.startswith('Z'):
             # newlines, non-breaking etc.
-            filtered.append(' ')
+            value = u' '
         elif cat.startswith('S'):
             # symbols, such as currency
-            continue
+            value = None
         else:
-            filtered.append(char)
-    text = ''.join(filtered)
-    while '  ' in text:
-        text = text.replace('  ', ' ')
+            value = code
+        self[code] = value
+        return value
+
+
+CATEGORY_TABLE = CategoryTable()
+SPACES = re.compile(u' {2,}')
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize(text):
+    """ Simplify a piece of text to generate a more canonical
+    representation. This involves lowercasing, stripping trailing
+    spaces, removing symbols, diacritical marks (umlauts) and
+    converting all newlines etc. to single spaces.
+    """
+    text = text.lower()
+    decomposed = ucnorm('NFKD', text)
+    text = decomposed.translate(CATEGORY_TABLE)
+    text = SPACES.sub(u' ', text)
     #remove hyphens
     text = text.replace('-', ' ')
     text = text.strip()
@@ -1,8 +1,7 @@
 
 import re
 import os
-
-import bleach
+import xml.etree.ElementTree as ET
 
 
 def get_env(name):
@@ -16,8 +15,12 @@ def remove_html(text):
     Using bleach remove all HTML markup from text.
     http://bleach.readthedocs.org/en/latest/clean.html#stripping-markup
     """
+    import bleach
     return bleach.clean(text, strip=True, tags=[])
 
+#doi.org and dx.doi.org resolver URLs, with or without the scheme.
+DOI_URL = re.compile(r'^(https?://)?(dx\.)?doi\.org/')
+
 def scrub_doi(val):
     """
     Get only the DOI.  Not other stuff.
@@ -26,11 +29,10 @@ def scrub_doi(val):
     v = remove_html(val)
     #lower case
     v = v.lower()
-    v = v.replace('http://dx.doi.org/', '')
-    v = v.replace('dx.doi.org/', '')
-    #leading DOI prefix
-    v = v.replace('doi:', '')
     v = v.replace(' ', '')
+    #resolver URL or leading DOI prefix
+    v = DOI_URL.sub('', v)
+    v = v.replace('doi:', '')
     return v.strip()
 
 def pull(meta, k):
@@ -65,3 +67,18 @@ def scrub_pmid(value):
     if v == 0:
         return None
     return v
+
+def iterparse_chunks(chunks, events=('end',)):
+    """
+    Incrementally parse XML from an iterable of byte chunks, e.g. a
+    streamed response's iter_content, yielding (event, element) pairs
+    as they are read.
+    """
+    parser = ET.XMLPullParser(events=events)
+    for chunk in chunks:
+        parser.feed(chunk)
+        for item in parser.read_events():
+            yield item
+    parser.close()
+    for item in parser.read_events():
+        yield item